@@ -0,0 +1,180 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+
+class Overloaded(Exception):
+    """A request was shed: its queue was full or it waited too long"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Over capacity ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class PriorityClass:
+    """Limits of one class of requests.
+
+    max_share caps the part of the capacity the class may hold at once,
+    max_wait is how long a request may queue before it is shed and
+    max_queued how many may wait before new ones are shed right away.
+    """
+
+    def __init__(self, name: str, max_share: float = 1.0, max_wait: float = 10.0, max_queued: int = 100):
+        self.name = name
+        self.max_share = max_share
+        self.max_wait = max_wait
+        self.max_queued = max_queued
+
+
+class Waiter:
+    def __init__(self, cost: float, future: asyncio.Future):
+        self.cost = cost
+        self.future = future
+
+
+class AdmissionController:
+    """Cost-based admission control with a priority queue per class.
+
+    Each request declares an estimated cost (e.g. pages to process) and a
+    class. Running requests hold at most `capacity` cost between them, and a
+    class at most its max_share of it, so bulk work can leave headroom for
+    interactive requests. A request that does not fit waits in its class's
+    FIFO queue. Queues are served in class order, and a waiting request
+    keeps requests of lower classes from overtaking it. A cost above what
+    the class may hold is clamped, so a huge request still runs, alone.
+
+    Shedding is fast: a full queue rejects at once with Overloaded, and a
+    request that could not start within max_wait leaves the queue with it.
+    Overloaded.retry_after is the average time requests have held their
+    slot, as a hint for when capacity should be free again.
+    """
+
+    def __init__(self, capacity: float, classes: List[PriorityClass]):
+        self.capacity = capacity
+        self.classes = {priority.name: priority for priority in classes}
+        self.in_flight = 0.0
+        self.running = 0
+        self.class_in_flight = {name: 0.0 for name in self.classes}
+        self.queues: Dict[str, Deque[Waiter]] = {name: deque() for name in self.classes}
+        self.admitted = {name: 0 for name in self.classes}
+        self.shed = {name: {"queue_full": 0, "timeout": 0} for name in self.classes}
+        self.wait_seconds = {name: 0.0 for name in self.classes}
+        self.average_hold = 1.0
+
+    def queued(self, name: str) -> int:
+        return sum(1 for waiter in self.queues[name] if not waiter.future.done())
+
+    def clamp(self, cost: float, name: str) -> float:
+        return min(max(cost, 0.0), self.capacity * self.classes[name].max_share)
+
+    def _fits(self, cost: float, name: str) -> Tuple[bool, bool]:
+        """(fits the total capacity, fits the class's share)"""
+        return (self.in_flight + cost <= self.capacity,
+                self.class_in_flight[name] + cost <= self.capacity * self.classes[name].max_share)
+
+    def _grant(self, cost: float, name: str) -> None:
+        self.in_flight += cost
+        self.class_in_flight[name] += cost
+        self.running += 1
+        self.admitted[name] += 1
+
+    def _dispatch(self) -> None:
+        """Start queued requests that now fit, highest class first"""
+        for name, queue in self.queues.items():
+            while queue:
+                waiter = queue[0]
+                if waiter.future.done():
+                    queue.popleft()
+                    continue
+                fits_total, fits_class = self._fits(waiter.cost, name)
+                if not fits_total:
+                    # Nothing behind this request may take the capacity it is waiting for
+                    return
+                if not fits_class:
+                    break
+                queue.popleft()
+                self._grant(waiter.cost, name)
+                waiter.future.set_result(None)
+
+    def _waiting_ahead(self, name: str) -> bool:
+        for other in self.classes:
+            if self.queued(other):
+                return True
+            if other == name:
+                return False
+        return False
+
+    def retry_after(self) -> int:
+        return min(60, max(1, math.ceil(self.average_hold)))
+
+    async def acquire(self, cost: float, name: str, shed: bool = True) -> Tuple[float, str, float]:
+        """Wait until the request may start and return its ticket for release().
+
+        Raises Overloaded when the request is shed; with shed=False (work
+        that was already accepted) it queues for as long as it takes.
+        """
+        priority = self.classes[name]
+        cost = self.clamp(cost, name)
+        started = time.monotonic()
+
+        if not self._waiting_ahead(name) and all(self._fits(cost, name)):
+            self._grant(cost, name)
+            return cost, name, started
+
+        if shed and self.queued(name) >= priority.max_queued:
+            self.shed[name]["queue_full"] += 1
+            raise Overloaded("queue_full", self.retry_after())
+
+        waiter = Waiter(cost, asyncio.get_running_loop().create_future())
+        self.queues[name].append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), priority.max_wait if shed else None)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            if waiter.future.done():
+                self.release((cost, name, time.monotonic()))
+            else:
+                waiter.future.cancel()
+                self._dispatch()
+            raise
+
+        now = time.monotonic()
+        if not waiter.future.done():
+            # Leaving the head of a queue can unblock the classes behind it
+            waiter.future.cancel()
+            self._dispatch()
+            self.shed[name]["timeout"] += 1
+            raise Overloaded("timeout", self.retry_after())
+
+        self.wait_seconds[name] += now - started
+        return cost, name, now
+
+    def release(self, ticket: Tuple[float, str, float]) -> None:
+        cost, name, started = ticket
+        self.in_flight = max(0.0, self.in_flight - cost)
+        self.class_in_flight[name] = max(0.0, self.class_in_flight[name] - cost)
+        self.running -= 1
+        self.average_hold += 0.1 * ((time.monotonic() - started) - self.average_hold)
+        self._dispatch()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "capacity": self.capacity,
+            "in_flight": round(self.in_flight, 1),
+            "running": self.running,
+            "average_hold_seconds": round(self.average_hold, 2),
+            "classes": {
+                name: {
+                    "in_flight": round(self.class_in_flight[name], 1),
+                    "queued": self.queued(name),
+                    "admitted": self.admitted[name],
+                    "shed": dict(self.shed[name]),
+                    "wait_seconds": round(self.wait_seconds[name], 2)
+                }
+                for name in self.classes
+            }
+        }
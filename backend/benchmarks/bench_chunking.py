@@ -0,0 +1,116 @@
+"""Benchmark the token-aware chunker against the original character chunker.
+
+Usage (from backend/):
+    python benchmarks/bench_chunking.py [--pages 1000] [--output results.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking import PAGE_BREAK, chunk_text, chunk_token_budget, estimate_tokens  # noqa: E402
+
+WORDS = (
+    "the study shows important results data analysis research market growth revenue "
+    "contract party shall agree term policy evidence model quarter customer risk"
+).split()
+
+
+def legacy_chunk_text(text, max_chars=6000):
+    """The chunker this module replaced, kept here for comparison"""
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks = []
+    sentences = text.split('. ')
+    current_chunk = ""
+
+    for sentence in sentences:
+        if len(current_chunk + sentence) <= max_chars:
+            current_chunk += sentence + ". "
+        else:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            current_chunk = sentence + ". "
+
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+
+    return chunks
+
+
+def synthetic_document(pages, seed=0):
+    """About 3,000 characters per page in four paragraphs, pages separated by PAGE_BREAK"""
+    rng = random.Random(seed)
+    page_texts = []
+    for _ in range(pages):
+        paragraphs = []
+        for _ in range(4):
+            sentences = [
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+                for _ in range(rng.randint(5, 9))
+            ]
+            paragraphs.append(" ".join(sentences))
+        page_texts.append("\n\n".join(paragraphs))
+    return PAGE_BREAK.join(page_texts)
+
+
+def measure(fn, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=0, help="Overlap tokens for the new chunker")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    budget = chunk_token_budget(["llama3-70b-8192"], max_output_tokens=800, cap=4000)
+    results = {"pages": args.pages, "token_budget": budget, "runs": []}
+
+    for pages in sorted({max(1, args.pages // 10), args.pages}):
+        text = synthetic_document(pages)
+
+        legacy_chunks, legacy_seconds = measure(lambda: legacy_chunk_text(text))
+        new_chunks, new_seconds = measure(lambda: chunk_text(text, max_tokens=budget, overlap_tokens=args.overlap))
+
+        results["runs"].append({
+            "pages": pages,
+            "characters": len(text),
+            "legacy": {
+                "seconds": round(legacy_seconds, 4),
+                "chunks": len(legacy_chunks),
+                "max_chunk_tokens": max(estimate_tokens(c) for c in legacy_chunks)
+            },
+            "token_aware": {
+                "seconds": round(new_seconds, 4),
+                "chunks": len(new_chunks),
+                "max_chunk_tokens": max(estimate_tokens(c) for c in new_chunks)
+            }
+        })
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+    over_budget = [run["pages"] for run in results["runs"] if run["token_aware"]["max_chunk_tokens"] > budget]
+    if over_budget:
+        sys.exit(f"Chunks over the {budget} token budget for {over_budget} pages")
+
+
+if __name__ == "__main__":
+    main()
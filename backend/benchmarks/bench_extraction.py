@@ -0,0 +1,104 @@
+"""Compare PDF extraction engines on pages/sec and memory.
+
+Usage (from backend/):
+    python benchmarks/bench_extraction.py [--sizes 10 100 1000] [--engines pypdf2 pypdfium2]
+        [--output results.json]
+
+Every (engine, size) run happens in a fresh spawned process that extracts
+the whole synthetic PDF on one core, so peak RSS is that engine's own
+footprint and pages/sec is comparable across engines. Engines that are not
+installed are skipped.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import pdf_extraction  # noqa: E402
+from corpus import write_corpus  # noqa: E402
+
+
+def rss_mb():
+    to_mb = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / to_mb
+
+
+def extract_whole_document(path, engine):
+    """Runs in the child process"""
+    baseline = rss_mb()
+    started = time.perf_counter()
+    page_count = pdf_extraction.count_pages(path, engine)
+    pages = pdf_extraction.extract_page_range(path, 0, page_count, engine)
+    seconds = time.perf_counter() - started
+    return {
+        "seconds": seconds,
+        "pages": page_count,
+        "characters": sum(len(page) for page in pages),
+        "empty_pages": sum(1 for page in pages if not page),
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": rss_mb()
+    }
+
+
+def run_isolated(path, engine):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(extract_whole_document, path, engine).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Corpus page counts")
+    parser.add_argument("--engines", nargs="+", default=pdf_extraction.available_engines())
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per engine and size (best is kept)")
+    parser.add_argument("--corpus-dir", help="Reuse/write the corpus here instead of a temp dir")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    installed = set(pdf_extraction.available_engines())
+    engines = [engine for engine in args.engines if engine in installed]
+    skipped = [engine for engine in args.engines if engine not in installed]
+
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="pdf_bench_")
+    paths = write_corpus(corpus_dir, args.sizes)
+
+    runs = []
+    for pages, path in zip(args.sizes, paths):
+        for engine in engines:
+            best = None
+            for _ in range(args.repeat):
+                result = run_isolated(path, engine)
+                if best is None or result["seconds"] < best["seconds"]:
+                    best = result
+            runs.append({
+                "engine": engine,
+                "pages": pages,
+                "file_bytes": os.path.getsize(path),
+                "seconds": round(best["seconds"], 4),
+                "pages_per_s": round(best["pages"] / best["seconds"], 1) if best["seconds"] else None,
+                "characters": best["characters"],
+                "empty_pages": best["empty_pages"],
+                "peak_rss_mb": round(best["peak_rss_mb"], 1),
+                "extraction_rss_mb": round(best["peak_rss_mb"] - best["baseline_rss_mb"], 1)
+            })
+            print(f"  {engine} {pages}p: {runs[-1]['pages_per_s']} pages/s", file=sys.stderr)
+
+    results = {"engines": engines, "skipped_engines": skipped, "runs": runs}
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark the extractive fallback summary against the one it replaced.
+
+Usage (from backend/):
+    python benchmarks/bench_fallback.py [--sizes 10 100 1000] [--output results.json]
+
+Both summarizers run over cleaned synthetic report text of each size.
+"coverage" is how far into the document the last quoted sentence sits
+(0 = start, 1 = end): the legacy summary never looks past the opening
+sentences, whatever the document length.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from corpus import synthetic_pages  # noqa: E402
+
+
+def legacy_fallback_sentences(text):
+    """Sentence selection of the fallback summary this one replaced"""
+    key_sentences = []
+    for sentence in text.split('.')[:10]:
+        sentence = sentence.strip()
+        if len(sentence) > 30:
+            key_sentences.append(sentence)
+            if len(key_sentences) >= 4:
+                break
+    return key_sentences
+
+
+def coverage(text, sentences):
+    positions = [text.find(sentence) for sentence in sentences]
+    positions = [position for position in positions if position >= 0]
+    return round(max(positions) / len(text), 3) if positions else 0.0
+
+
+def measure(fn, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Document page counts")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size (best is kept)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    import main as backend
+    from extractive import SentenceRanker
+
+    runs = []
+    for pages in args.sizes:
+        text = backend.clean_text(backend.PAGE_BREAK.join("\n".join(lines) for lines in synthetic_pages(pages, pages)))
+
+        legacy, legacy_seconds = measure(lambda: legacy_fallback_sentences(text), args.repeat)
+        ranker, ranking_seconds = measure(lambda: SentenceRanker(text), args.repeat)
+        _, summary_seconds = measure(lambda: backend.generate_formatted_fallback_summary(text), args.repeat)
+        key_points = [ranker.sentences[i] for i in ranker.top(backend.FALLBACK_KEY_POINTS)]
+
+        runs.append({
+            "pages": pages,
+            "characters": len(text),
+            "sentences": len(ranker),
+            "legacy": {"seconds": round(legacy_seconds, 4), "coverage": coverage(text, legacy)},
+            "extractive": {
+                "ranking_seconds": round(ranking_seconds, 4),
+                "summary_seconds": round(summary_seconds, 4),
+                "coverage": coverage(text, key_points)
+            }
+        })
+        print(f"  {pages}p: {runs[-1]['extractive']['summary_seconds']}s", file=sys.stderr)
+
+    output = json.dumps({"runs": runs}, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""End-to-end benchmarks of the backend against a local mock LLM server.
+
+Usage (from backend/):
+    python benchmarks/bench_pipeline.py [--sizes 1 10 100] [--requests 8] [--concurrency 4]
+        [--latency 0.2] [--rate-limit-ratio 0.0] [--scenarios extraction chunking process ask stream]
+        [--output results.json]
+
+Scenarios:
+    extraction  extract_text_from_pdf per corpus size (pages/sec)
+    chunking    chunk_text over the extracted text
+    process     concurrent POST /process of distinct PDFs of each size
+    ask         concurrent POST /ask against a cached doc_id
+    stream      concurrent POST /process/stream, time to first summary token
+
+Each scenario reports throughput, p50/p99 latency and peak memory (RSS
+of this process sampled during the scenario, plus the max RSS of the
+extraction workers). Only RSS is measured: tracemalloc would slow every
+allocation and skew the timings, so there is no Python heap figure.
+
+The LLM response cache is off by default so every run pays for
+its calls; set LLM_CACHE_ENABLED=true to measure warm runs instead. The
+client-side rate limiter is off too, since its Groq free-tier budgets would
+dominate the timings; set RATE_LIMIT_ENABLED=true to include it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from corpus import write_corpus  # noqa: E402
+from mock_llm_server import MockServerThread, ServerThread  # noqa: E402
+
+QUESTIONS = [
+    "What are the main findings of the report?",
+    "How is revenue growth measured?",
+    "Which obligations does the contract define?",
+    "What risks are identified?",
+]
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def latency_summary(latencies, wall_seconds):
+    return {
+        "requests": len(latencies),
+        "throughput_per_s": round(len(latencies) / wall_seconds, 3) if wall_seconds else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+        "wall_s": round(wall_seconds, 3)
+    }
+
+
+def max_rss_mb():
+    """Peak resident memory of this process and of finished/live children, in MB"""
+    to_mb = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / to_mb
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / to_mb
+    return round(own, 1), round(children, 1)
+
+
+def current_rss_mb():
+    """Resident memory right now (Linux); falls back to the peak so far elsewhere"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return max_rss_mb()[0]
+
+
+class RssSampler:
+    """Track the peak RSS of this process while a scenario runs"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, current_rss_mb())
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self.peak = max(self.peak, current_rss_mb())
+
+
+async def run_measured(scenario, coroutine_factory):
+    """Run a scenario and attach its peak memory"""
+    with RssSampler() as sampler:
+        result = await coroutine_factory()
+    _, child_rss = max_rss_mb()
+    result["memory"] = {
+        "peak_rss_mb": round(sampler.peak, 1),
+        "max_rss_children_mb": child_rss
+    }
+    print(f"  {scenario}: done", file=sys.stderr)
+    return result
+
+
+async def concurrent(calls, concurrency):
+    """Run zero-argument coroutine factories with bounded concurrency, returning per-call latencies"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(call):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            ok = await call()
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(call) for call in calls))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def bench_extraction(backend, corpus, repeat):
+    runs = []
+    for pages, paths in corpus.items():
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            text = await backend.extract_text_from_pdf(paths[0])
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        runs.append({
+            "pages": pages,
+            "seconds": round(best, 4),
+            "pages_per_s": round(pages / best, 1),
+            "characters": len(text)
+        })
+    return {"runs": runs}
+
+
+async def bench_chunking(backend, corpus, repeat):
+    runs = []
+    for pages, paths in corpus.items():
+        text = backend.clean_text(await backend.extract_text_from_pdf(paths[0]))
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            chunks = backend.chunk_text(text, max_tokens=backend.summary_chunk_tokens(),
+                                        overlap_tokens=backend.SUMMARY_CHUNK_OVERLAP_TOKENS)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        runs.append({"pages": pages, "seconds": round(best, 4), "chunks": len(chunks)})
+    return {"runs": runs}
+
+
+async def bench_process(client, corpus, requests, concurrency):
+    runs = []
+    for pages, paths in corpus.items():
+        def call_for(path):
+            async def call():
+                with open(path, "rb") as f:
+                    response = await client.post(
+                        "/process", files={"file": (os.path.basename(path), f.read(), "application/pdf")}
+                    )
+                return response.status_code == 200
+            return call
+
+        calls = [call_for(paths[i % len(paths)]) for i in range(requests)]
+        latencies, errors, wall = await concurrent(calls, concurrency)
+        runs.append({"pages": pages, "errors": errors, **latency_summary(latencies, wall)})
+    return {"runs": runs}
+
+
+async def bench_ask(client, corpus, requests, concurrency):
+    runs = []
+    for pages, paths in corpus.items():
+        with open(paths[0], "rb") as f:
+            response = await client.post(
+                "/ask",
+                data={"question": QUESTIONS[0]},
+                files={"file": (os.path.basename(paths[0]), f.read(), "application/pdf")}
+            )
+        doc_id = response.json()["doc_id"]
+
+        def call_for(i):
+            async def call():
+                response = await client.post(
+                    "/ask", data={"question": f"{QUESTIONS[i % len(QUESTIONS)]} ({i})", "doc_id": doc_id}
+                )
+                return response.status_code == 200
+            return call
+
+        latencies, errors, wall = await concurrent([call_for(i) for i in range(requests)], concurrency)
+        runs.append({"pages": pages, "errors": errors, **latency_summary(latencies, wall)})
+    return {"runs": runs}
+
+
+async def bench_stream(client, corpus, requests, concurrency):
+    runs = []
+    for pages, paths in corpus.items():
+        first_token = []
+
+        def call_for(path):
+            async def call():
+                with open(path, "rb") as f:
+                    content = f.read()
+                started = time.perf_counter()
+                seen_token = False
+                async with client.stream(
+                    "POST", "/process/stream",
+                    files={"file": (os.path.basename(path), content, "application/pdf")}
+                ) as response:
+                    if response.status_code != 200:
+                        return False
+                    async for line in response.aiter_lines():
+                        if not seen_token and line == "event: summary_token":
+                            first_token.append(time.perf_counter() - started)
+                            seen_token = True
+                return True
+            return call
+
+        calls = [call_for(paths[i % len(paths)]) for i in range(requests)]
+        latencies, errors, wall = await concurrent(calls, concurrency)
+        summary = latency_summary(latencies, wall)
+        summary["first_token_p50_ms"] = round(percentile(first_token, 0.5) * 1000, 1) if first_token else None
+        runs.append({"pages": pages, "errors": errors, **summary})
+    return {"runs": runs}
+
+
+async def run(args, corpus, mock, backend, backend_url):
+    import httpx
+
+    results = {}
+    # Requests go over real HTTP to the backend so streamed events arrive as they are sent
+    async with httpx.AsyncClient(base_url=backend_url, timeout=None) as client:
+        scenarios = {
+            "extraction": lambda: bench_extraction(backend, corpus, args.repeat),
+            "chunking": lambda: bench_chunking(backend, corpus, args.repeat),
+            "process": lambda: bench_process(client, corpus, args.requests, args.concurrency),
+            "ask": lambda: bench_ask(client, corpus, args.requests, args.concurrency),
+            "stream": lambda: bench_stream(client, corpus, args.requests, args.concurrency),
+        }
+        for name in args.scenarios:
+            before = mock.stats
+            results[name] = await run_measured(name, scenarios[name])
+            after = mock.stats
+            results[name]["llm_calls"] = after["requests"] - before["requests"]
+            results[name]["llm_rate_limited"] = after["rate_limited"] - before["rate_limited"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100], help="Corpus page counts")
+    parser.add_argument("--requests", type=int, default=8, help="Requests per size and scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent client requests")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeats for the extraction/chunking timings")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock LLM seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="Share of mock calls answered 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--scenarios", nargs="+", default=["extraction", "chunking", "process", "ask", "stream"],
+                        choices=["extraction", "chunking", "process", "ask", "stream"])
+    parser.add_argument("--corpus-dir", help="Reuse/write the corpus here instead of a temp dir")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    mock = MockServerThread(
+        latency=args.latency, jitter=args.jitter,
+        rate_limit_ratio=args.rate_limit_ratio, retry_after=args.retry_after
+    ).start()
+
+    # Must be set before main is imported - it reads its configuration at import time
+    os.environ["GROQ_API_URL"] = mock.url
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="pdf_bench_")
+    copies = max(1, min(args.requests, 8))
+    print(f"Writing corpus to {corpus_dir}", file=sys.stderr)
+    paths = write_corpus(corpus_dir, args.sizes, copies)
+    corpus = {pages: paths[i * copies:(i + 1) * copies] for i, pages in enumerate(args.sizes)}
+
+    import main as backend
+
+    backend_server = ServerThread(backend.app).start()
+    try:
+        scenario_results = asyncio.run(run(args, corpus, mock, backend, backend_server.base_url))
+    finally:
+        backend_server.stop()
+        mock.stop()
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "corpus_dir")},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "scenarios": scenario_results
+    }
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Generate a corpus of synthetic text PDFs for the benchmarks.
+
+Usage (from backend/):
+    python benchmarks/corpus.py [--sizes 1 10 100 1000] [--out-dir bench_corpus]
+
+The PDFs are written directly (Helvetica text, one content stream per page),
+so no PDF library is needed. Every page has a running header and footer
+like a real report, about 40 lines of body text and numbered sections.
+"""
+import argparse
+import os
+import random
+from typing import List
+
+WORDS = (
+    "the study shows important results data analysis research market growth revenue "
+    "contract party shall agree term policy evidence model quarter customer risk "
+    "section agreement payment obligation report findings method sample increase"
+).split()
+
+LINES_PER_PAGE = 40
+
+
+def escape_pdf_text(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """Minimal PDF 1.4 document with one page per list of text lines"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        (
+            "<< /Type /Pages /Kids [" + " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages)))
+            + f"] /Count {len(pages)} >>"
+        ).encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, lines in enumerate(pages):
+        objects.append((
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        ).encode())
+        operations = ["BT /F1 10 Tf 40 760 Td 12 TL"]
+        operations.extend(f"({escape_pdf_text(line)}) Tj T*" for line in lines)
+        operations.append("ET")
+        stream = "\n".join(operations).encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+
+    xref_offset = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def synthetic_pages(page_count: int, seed: int = 0) -> List[List[str]]:
+    """Report-like pages: header, numbered sections of sentences, page-number footer"""
+    rng = random.Random(seed)
+    pages = []
+    section = 0
+    for page_number in range(1, page_count + 1):
+        lines = [f"ACME Corporation - Annual Report {2000 + seed % 25}"]
+        while len(lines) < LINES_PER_PAGE:
+            if rng.random() < 0.08:
+                section += 1
+                lines.append("")
+                lines.append(f"{section}. {rng.choice(WORDS).capitalize()} {rng.choice(WORDS)}")
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14)))
+            lines.append(sentence.capitalize() + ".")
+        lines.append(f"Page {page_number} of {page_count}")
+        pages.append(lines)
+    return pages
+
+
+def synthetic_pdf(page_count: int, seed: int = 0) -> bytes:
+    return make_pdf(synthetic_pages(page_count, seed))
+
+
+def write_corpus(out_dir: str, sizes: List[int], copies: int = 1) -> List[str]:
+    """Write `copies` distinct PDFs per size and return their paths"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for pages in sizes:
+        for copy in range(copies):
+            path = os.path.join(out_dir, f"synthetic_{pages:04d}p_{copy}.pdf")
+            with open(path, "wb") as f:
+                f.write(synthetic_pdf(pages, seed=pages * 1000 + copy))
+            paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000], help="Page counts")
+    parser.add_argument("--copies", type=int, default=1, help="Distinct PDFs per size")
+    parser.add_argument("--out-dir", default="bench_corpus")
+    args = parser.parse_args()
+
+    for path in write_corpus(args.out_dir, args.sizes, args.copies):
+        print(f"{path} ({os.path.getsize(path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
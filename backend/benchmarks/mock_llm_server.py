@@ -0,0 +1,173 @@
+"""Local fake of the Groq chat-completions API for benchmarks.
+
+Usage (from backend/):
+    python benchmarks/mock_llm_server.py [--port 8900] [--latency 0.5] [--rate-limit-ratio 0.05]
+
+Then point the backend at it:
+    GROQ_API_URL=http://127.0.0.1:8900/openai/v1/chat/completions GROQ_API_KEY=mock uvicorn main:app
+
+Latency is drawn uniformly from latency +/- jitter. A rate_limit_ratio share
+of calls gets a 429 with Retry-After, and "stream": true requests are
+answered as Server-Sent Events. GET /stats reports what was served.
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SUMMARY_TEXT = """**Document Overview:**
+A synthetic report used for benchmarking the summarization pipeline.
+
+**Main Purpose:**
+To exercise chunking, map-reduce summarization and question answering under load.
+
+**Key Points:**
+• Revenue and market growth are discussed across several sections.
+• The contract terms define obligations for each party.
+• Risk and policy findings are supported by data analysis.
+• Customer research informs the proposed model.
+
+**Important Details:**
+Quarterly results, sample sizes and payment terms appear throughout the document.
+
+**Conclusions & Implications:**
+The findings suggest continued growth with manageable risk."""
+
+QUESTIONS_TEXT = """What are the main findings of the report?
+2. How is revenue growth measured?
+3. Which obligations does the contract define?
+4. What risks are identified?
+5. How was the data analysis performed?"""
+
+
+def mock_completion(prompt: str) -> str:
+    if "generate 5 relevant and specific questions" in prompt:
+        return QUESTIONS_TEXT
+    if "Questions:\n1." in prompt:
+        count = prompt.count("\n", prompt.index("Questions:"), prompt.index("Document:")) - 2
+        return "\n\n".join(f"### Question {i + 1}\n{SUMMARY_TEXT}" for i in range(max(1, count)))
+    return SUMMARY_TEXT
+
+
+def create_app(latency: float = 0.5, jitter: float = 0.1, rate_limit_ratio: float = 0.0,
+               retry_after: float = 1.0, token_delay: float = 0.005, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Mock chat completions")
+    rng = random.Random(seed)
+    stats = {"requests": 0, "rate_limited": 0, "streamed": 0, "in_flight": 0, "peak_in_flight": 0}
+    app.state.stats = stats
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+
+        if rng.random() < rate_limit_ratio:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": str(retry_after)}
+            )
+
+        stats["in_flight"] += 1
+        stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(max(0.0, latency + rng.uniform(-jitter, jitter)))
+        finally:
+            stats["in_flight"] -= 1
+
+        content = mock_completion(body["messages"][-1]["content"])
+
+        if body.get("stream"):
+            stats["streamed"] += 1
+
+            async def events():
+                for word in content.split(" "):
+                    chunk = {"choices": [{"delta": {"content": word + " "}}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    if token_delay:
+                        await asyncio.sleep(token_delay)
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        return {
+            "id": f"mock-{stats['requests']}",
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+class ServerThread:
+    """Serve an ASGI app with uvicorn from a background thread"""
+
+    def __init__(self, app, port: int = 0):
+        config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.server.servers[0].sockets[0].getsockname()[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("Server failed to start")
+            time.sleep(0.02)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+class MockServerThread(ServerThread):
+    """The mock LLM server in a background thread (for benchmarks in one process)"""
+
+    def __init__(self, port: int = 0, **options):
+        self.app = create_app(**options)
+        super().__init__(self.app, port)
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/openai/v1/chat/completions"
+
+    @property
+    def stats(self) -> dict:
+        return dict(self.app.state.stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="Share of calls answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--token-delay", type=float, default=0.005, help="Seconds between streamed tokens")
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.jitter, args.rate_limit_ratio, args.retry_after, args.token_delay)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+import re
+import zlib
+from typing import List, Optional, Tuple
+
+# Page breaks are marked with a form feed by extraction; paragraphs with a blank line
+PAGE_BREAK = "\f"
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+
+# Boundary strength of the gap before a unit
+SENTENCE = 0
+PARAGRAPH = 1
+PAGE = 2
+
+CHARS_PER_TOKEN = 4
+
+# Context windows of the models we route to
+MODEL_CONTEXT_TOKENS = {
+    "llama3-70b-8192": 8192,
+    "llama3-8b-8192": 8192,
+    "mixtral-8x7b-32768": 32768,
+    "gemma-7b-it": 8192,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (about four characters per token for English)"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def chunk_token_budget(models: List[str], max_output_tokens: int, prompt_overhead_tokens: int = 300,
+                       cap: Optional[int] = None) -> int:
+    """Largest chunk that fits every model a call may be routed to, after the prompt and output"""
+    context = min(MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS) for model in models)
+    budget = context - max_output_tokens - prompt_overhead_tokens
+    if cap:
+        budget = min(budget, cap)
+    return max(budget, 64)
+
+
+def split_units(text: str, max_tokens: int) -> List[Tuple[str, int, int]]:
+    """Break text into (unit, tokens, boundary) triples, one per sentence.
+
+    Units longer than max_tokens are cut on whitespace so that every unit
+    fits in a chunk on its own.
+    """
+    units = []
+    max_chars = max_tokens * CHARS_PER_TOKEN - 1  # estimate_tokens rounds up
+
+    for page_number, page in enumerate(text.split(PAGE_BREAK)):
+        for paragraph_number, paragraph in enumerate(PARAGRAPH_BREAK.split(page)):
+            boundary = PAGE if paragraph_number == 0 and page_number > 0 else PARAGRAPH
+            for sentence in SENTENCE_BREAK.split(paragraph.strip()):
+                sentence = " ".join(sentence.split())
+                if not sentence:
+                    continue
+                for piece in split_long_unit(sentence, max_chars):
+                    units.append((piece, estimate_tokens(piece), boundary))
+                    boundary = SENTENCE
+
+    return units
+
+
+def split_long_unit(unit: str, max_chars: int) -> List[str]:
+    """Cut an over-long sentence into word-aligned pieces of at most max_chars"""
+    if len(unit) <= max_chars:
+        return [unit]
+
+    pieces = []
+    start = 0
+    while start < len(unit):
+        end = min(start + max_chars, len(unit))
+        if end < len(unit):
+            space = unit.rfind(" ", start, end)
+            if space > start:
+                end = space
+        pieces.append(unit[start:end].strip())
+        start = end
+    return [piece for piece in pieces if piece]
+
+
+def join_units(units: List[Tuple[str, int, int]]) -> str:
+    """Rebuild chunk text, keeping paragraph and page breaks as blank lines"""
+    parts = []
+    for i, (unit, _, boundary) in enumerate(units):
+        if i > 0:
+            parts.append("\n\n" if boundary >= PARAGRAPH else " ")
+        parts.append(unit)
+    return "".join(parts)
+
+
+def chunk_text(text: str, max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """Split text into chunks of at most max_tokens estimated tokens.
+
+    Sentences are packed greedily. When a chunk overflows and it is at least
+    half full, it is closed at its last page or paragraph break instead, and
+    the sentences after that break start the next chunk. Each chunk after the
+    first repeats up to overlap_tokens of trailing sentences from the one
+    before. Runs in linear time: every sentence is joined once and moved at
+    most once.
+    """
+    units = split_units(text, max_tokens)
+    if not units:
+        return []
+
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 4))
+    chunks = []
+    current: List[Tuple[str, int, int]] = []
+    current_tokens = 0
+    last_break = 0  # Index in current of the last unit that starts a page or paragraph
+    overlap_count = 0  # Leading units of current repeated from the previous chunk
+
+    for unit in units:
+        _, unit_tokens, boundary = unit
+
+        if current and len(current) == overlap_count and current_tokens + unit_tokens > max_tokens:
+            # Never emit a chunk made only of repeated overlap
+            current = []
+            current_tokens = 0
+            overlap_count = 0
+
+        if current and current_tokens + unit_tokens > max_tokens:
+            carried = []
+            if last_break > 0 and sum(u[1] for u in current[:last_break]) >= max_tokens // 2:
+                carried = current[last_break:]
+                current = current[:last_break]
+            chunks.append(join_units(current))
+
+            overlap = []
+            if overlap_tokens:
+                overlap_total = 0
+                for previous in reversed(current):
+                    if overlap_total + previous[1] > overlap_tokens:
+                        break
+                    overlap.insert(0, previous)
+                    overlap_total += previous[1]
+
+            # The new chunk must still take the overflowing unit: drop the
+            # overlap first, then close the carried sentences on their own
+            if sum(u[1] for u in overlap + carried) + unit_tokens > max_tokens:
+                overlap = []
+            if carried and sum(u[1] for u in carried) + unit_tokens > max_tokens:
+                chunks.append(join_units(carried))
+                carried = []
+            current = overlap + carried
+            current_tokens = sum(u[1] for u in current)
+            overlap_count = len(overlap)
+            last_break = 0
+
+        if boundary >= PARAGRAPH and current:
+            last_break = len(current)
+        current.append(unit)
+        current_tokens += unit_tokens
+
+    if current:
+        chunks.append(join_units(current))
+
+    return chunks
+
+
+class ChunkAccumulator:
+    """chunk_text for a document that arrives one page at a time.
+
+    Once the buffered text overflows a chunk, every chunk but the last is
+    emitted: each was closed by the sentence that overflowed it, so it is the
+    same chunk chunk_text would produce for the whole document. The last one
+    may still grow and is buffered with the next pages. The buffer stays at
+    about one chunk plus one page, so the total work remains linear.
+    """
+
+    def __init__(self, max_tokens: int, overlap_tokens: int = 0):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self._parts: List[str] = []
+        self._tokens = 0
+
+    def add(self, page: str) -> List[str]:
+        """Add the next page and return the chunks that are now complete"""
+        self._parts.append(page)
+        self._tokens += estimate_tokens(page)
+        if self._tokens <= self.max_tokens:
+            return []
+
+        chunks = chunk_text(PAGE_BREAK.join(self._parts), self.max_tokens, self.overlap_tokens)
+        last = chunks.pop() if chunks else ""
+        self._parts = [last] if last else []
+        self._tokens = estimate_tokens(last) if last else 0
+        return chunks
+
+    def finish(self) -> List[str]:
+        """Chunks of whatever is still buffered"""
+        chunks = chunk_text(PAGE_BREAK.join(self._parts), self.max_tokens, self.overlap_tokens)
+        self._parts = []
+        self._tokens = 0
+        return chunks
+
+
+class PageChunkAccumulator:
+    """Chunks made of whole pages, with boundaries chosen by page content.
+
+    A page whose content hash is divisible by anchor_every always ends a
+    chunk; between two such anchor pages, pages are packed greedily up to
+    max_tokens. Where a chunk ends therefore depends only on the pages since
+    the last anchor, so an edited, inserted or deleted page changes the
+    chunks up to the next anchor and every other chunk comes out identical,
+    which lets their summaries be reused for a revised document. A page
+    longer than max_tokens is split with chunk_text on its own.
+    Same add()/finish() interface as ChunkAccumulator.
+    """
+
+    def __init__(self, max_tokens: int, anchor_every: int = 8):
+        self.max_tokens = max_tokens
+        self.anchor_every = max(1, anchor_every)
+        self._pages: List[str] = []
+        self._tokens = 0
+
+    def add(self, page: str) -> List[str]:
+        """Add the next page and return the chunks that are now complete"""
+        page_tokens = estimate_tokens(page)
+        chunks = []
+        if self._pages and self._tokens + page_tokens > self.max_tokens:
+            chunks.extend(self.finish())
+
+        if page_tokens > self.max_tokens:
+            chunks.extend(chunk_text(page, self.max_tokens))
+            return chunks
+
+        self._pages.append(page)
+        self._tokens += page_tokens
+        if zlib.crc32(page.encode("utf-8")) % self.anchor_every == 0:
+            chunks.extend(self.finish())
+        return chunks
+
+    def finish(self) -> List[str]:
+        """The chunk of whatever is still buffered"""
+        chunks = ["\n\n".join(self._pages)] if self._pages else []
+        self._pages = []
+        self._tokens = 0
+        return chunks
+
+
+def chunk_pages(pages: List[str], max_tokens: int, anchor_every: int = 8) -> List[str]:
+    """Split a document into page-aligned, content-defined chunks (see PageChunkAccumulator)"""
+    accumulator = PageChunkAccumulator(max_tokens, anchor_every)
+    chunks = []
+    for page in pages:
+        chunks.extend(accumulator.add(page))
+    chunks.extend(accumulator.finish())
+    return chunks
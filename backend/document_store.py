@@ -0,0 +1,211 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DOC_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def is_valid_doc_id(doc_id: str) -> bool:
+    """Check a client supplied doc_id before using it as a key or file name"""
+    return bool(doc_id) and bool(DOC_ID_PATTERN.match(doc_id))
+
+
+class DocumentStore:
+    """Extracted documents keyed by doc_id.
+
+    Entries live in a size-bounded LRU in memory. When ``disk_dir`` is set,
+    every entry is also written there as JSON so it survives eviction and
+    restarts; a memory miss falls through to disk and re-warms the LRU.
+    Only JSON-serializable fields are persisted. Disk access runs in a
+    worker thread to keep the event loop free. Files are touched when read,
+    and the least recently used ones are removed once the directory holds
+    more than max_disk_items files or max_disk_bytes bytes.
+    """
+
+    def __init__(self, max_items: int = 64, max_bytes: int = 256 * 1024 * 1024,
+                 disk_dir: Optional[str] = None, max_disk_items: int = 10000,
+                 max_disk_bytes: int = 4 * 1024 * 1024 * 1024):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_items = max_disk_items
+        self.max_disk_bytes = max_disk_bytes
+        self._writes_since_purge = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    async def contains(self, doc_id: str) -> bool:
+        if not is_valid_doc_id(doc_id):
+            return False
+        if doc_id in self._entries:
+            return True
+        return self.disk_dir is not None and await asyncio.to_thread(os.path.exists, self._disk_path(doc_id))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    async def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Return the cached document or None, checking memory then disk"""
+        if not is_valid_doc_id(doc_id):
+            return None
+
+        document = self._entries.get(doc_id)
+        if document is not None:
+            self._entries.move_to_end(doc_id)
+            self.hits += 1
+            return document
+
+        document = await asyncio.to_thread(self._read_from_disk, doc_id) if self.disk_dir else None
+        if document is not None:
+            self._remember(doc_id, document)
+            self.hits += 1
+            return document
+
+        self.misses += 1
+        return None
+
+    def peek(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Return the in-memory entry without touching LRU order, stats or disk"""
+        return self._entries.get(doc_id)
+
+    async def put(self, doc_id: str, document: Dict[str, Any]) -> None:
+        """Cache a document in memory and, if configured, on disk"""
+        if not is_valid_doc_id(doc_id):
+            raise ValueError(f"Invalid doc_id: {doc_id}")
+
+        self._remember(doc_id, document)
+        if self.disk_dir:
+            serializable = {
+                key: value for key, value in document.items()
+                if isinstance(value, (str, int, float, bool, list, dict)) or value is None
+            }
+            await asyncio.to_thread(self._write_to_disk, doc_id, serializable)
+
+    def attach(self, doc_id: str, key: str, value: Any) -> bool:
+        """Add an in-memory only field (e.g. an index) to a cached document.
+
+        The entry is re-sized, so the field counts toward max_bytes and is
+        evicted with the document. Returns False when the document is not in
+        memory.
+        """
+        document = self._entries.get(doc_id)
+        if document is None:
+            return False
+        document[key] = value
+        self._remember(doc_id, document)
+        return True
+
+    async def discard(self, doc_id: str) -> None:
+        """Drop a document from both tiers"""
+        self._forget(doc_id)
+        if self.disk_dir and is_valid_doc_id(doc_id):
+            await asyncio.to_thread(self._remove_from_disk, doc_id)
+
+    def _remember(self, doc_id: str, document: Dict[str, Any]) -> None:
+        self._forget(doc_id)
+
+        size = self._estimate_size(document)
+        self._entries[doc_id] = document
+        self._sizes[doc_id] = size
+        self._total_bytes += size
+
+        # Evict least recently used entries, but always keep the newest one
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_items or self._total_bytes > self.max_bytes
+        ):
+            evicted_id, _ = self._entries.popitem(last=False)
+            self._total_bytes -= self._sizes.pop(evicted_id, 0)
+            logger.info(f"Evicted document {evicted_id[:12]} from memory cache")
+
+    def _forget(self, doc_id: str) -> None:
+        if doc_id in self._entries:
+            del self._entries[doc_id]
+            self._total_bytes -= self._sizes.pop(doc_id, 0)
+
+    def _estimate_size(self, document: Dict[str, Any]) -> int:
+        size = 0
+        for value in document.values():
+            if isinstance(value, str):
+                size += len(value)
+            elif hasattr(value, "estimated_bytes"):
+                size += value.estimated_bytes()
+        return size
+
+    def _disk_path(self, doc_id: str) -> str:
+        return os.path.join(self.disk_dir, f"{doc_id}.json")
+
+    def _read_from_disk(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(doc_id)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                document = json.load(f)
+            os.utime(path)
+            return document
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Could not read cached document {doc_id[:12]}: {str(e)}")
+            return None
+
+    def _remove_from_disk(self, doc_id: str) -> None:
+        try:
+            os.remove(self._disk_path(doc_id))
+        except FileNotFoundError:
+            pass
+
+    def _write_to_disk(self, doc_id: str, serializable: Dict[str, Any]) -> None:
+        path = self._disk_path(doc_id)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(serializable, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not write cached document {doc_id[:12]}: {str(e)}")
+        self._purge_now_and_then()
+
+    def _purge_now_and_then(self) -> None:
+        """Remove the least recently used files past the disk limits, every 100 writes"""
+        self._writes_since_purge += 1
+        if self._writes_since_purge < 100:
+            return
+        self._writes_since_purge = 0
+
+        files = []
+        with os.scandir(self.disk_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        # Newest first: keep files while both budgets allow
+        files.sort(reverse=True)
+        kept_bytes = 0
+        for position, (_, size, path) in enumerate(files):
+            kept_bytes += size
+            if position >= self.max_disk_items or kept_bytes > self.max_disk_bytes:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,141 @@
+import itertools
+import re
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from retrieval import STOPWORDS, TOKEN_PATTERN
+
+# Sentence ends, blank lines and page breaks all end a sentence
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n\s*\n|\f')
+TOKEN_OR_BREAK = re.compile(TOKEN_PATTERN.pattern + r'|\n')
+
+
+def split_sentences(text: str, min_chars: int = 30, max_chars: int = 500) -> List[str]:
+    """Distinct sentences worth quoting: whitespace-normalized, neither fragments nor run-ons"""
+    sentences = {}
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        sentence = " ".join(sentence.split())
+        if min_chars <= len(sentence) <= max_chars:
+            sentences.setdefault(sentence, None)
+    return list(sentences)
+
+
+class SentenceRanker:
+    """TextRank over TF-IDF sentence vectors of a whole document.
+
+    The sentence-term matrix X is kept as coordinate arrays and every product
+    with it is a bincount over its non-zeros. PageRank on the cosine
+    similarity graph only needs X (X^T v), so the n x n graph is never built
+    and each iteration is linear in the number of words.
+    """
+
+    def __init__(self, text: str, damping: float = 0.85, iterations: int = 30, tolerance: float = 1e-6):
+        self.sentences = split_sentences(text)
+        self.scores = np.zeros(len(self.sentences))
+        self.terms: List[str] = []
+
+        # Tokenize every sentence in one regex pass: sentences are joined by
+        # newlines (they contain none) and each newline token starts a new row
+        tokens = TOKEN_OR_BREAK.findall("\n".join(self.sentences).lower())
+        if not tokens:
+            return
+        # Label each token with the position of its first occurrence (the
+        # mapping runs in C), then compact those labels into term ids
+        first_seen = {}
+        first_positions = np.fromiter(
+            map(first_seen.setdefault, tokens, itertools.count()), dtype=np.int64, count=len(tokens)
+        )
+        term_positions, token_ids = np.unique(first_positions, return_inverse=True)
+        self.terms = [tokens[i] for i in term_positions.tolist()]
+        token_rows = np.cumsum(first_positions == first_seen.get("\n", -1))
+        kept_terms = np.array([len(term) > 1 and term not in STOPWORDS for term in self.terms])
+        keep = kept_terms[token_ids]
+        if not keep.any():
+            return
+
+        n = len(self.sentences)
+        vocabulary_size = len(self.terms)
+        # Merge repeated (sentence, term) pairs into term frequencies; pairs come out sorted by sentence
+        pairs, frequencies = np.unique(token_rows[keep] * vocabulary_size + token_ids[keep], return_counts=True)
+        self._rows = pairs // vocabulary_size
+        self._columns = pairs % vocabulary_size
+        self._row_starts = np.searchsorted(self._rows, np.arange(n + 1))
+
+        document_frequency = np.bincount(self._columns, minlength=vocabulary_size)
+        idf = np.log((n + 1) / (document_frequency + 1)) + 1
+        values = (1 + np.log(frequencies)) * idf[self._columns]
+        norms = np.sqrt(np.bincount(self._rows, weights=values * values, minlength=n))
+        norms[norms == 0] = 1
+        self._values = values / norms[self._rows]
+        self._n = n
+        self._vocabulary_size = vocabulary_size
+        self._self_similarity = np.bincount(self._rows, weights=self._values * self._values, minlength=n)
+
+        self.scores = self._textrank(damping, iterations, tolerance)
+
+    def _term_set(self, i: int) -> frozenset:
+        return frozenset(self._columns[self._row_starts[i]:self._row_starts[i + 1]].tolist())
+
+    def _similarity_product(self, vector: np.ndarray) -> np.ndarray:
+        """(X X^T) vector without the diagonal, i.e. summed similarity to the other sentences"""
+        term_weights = np.bincount(self._columns, weights=self._values * vector[self._rows],
+                                   minlength=self._vocabulary_size)
+        product = np.bincount(self._rows, weights=self._values * term_weights[self._columns], minlength=self._n)
+        return product - self._self_similarity * vector
+
+    def _textrank(self, damping: float, iterations: int, tolerance: float) -> np.ndarray:
+        degree = self._similarity_product(np.ones(self._n))
+        connected = degree > 1e-12
+        inverse_degree = np.where(connected, 1 / np.where(connected, degree, 1), 0)
+
+        scores = np.full(self._n, 1 / self._n)
+        for _ in range(iterations):
+            updated = (1 - damping) / self._n + damping * self._similarity_product(scores * inverse_degree)
+            converged = np.abs(updated - scores).sum() < tolerance
+            scores = updated
+            if converged:
+                break
+        return scores
+
+    def __len__(self) -> int:
+        return len(self.sentences)
+
+    def top_terms(self, k: int = 5) -> List[str]:
+        """Terms carrying the most TF-IDF weight across the document"""
+        if not self.scores.any():
+            return []
+        weights = np.bincount(self._columns, weights=self._values, minlength=self._vocabulary_size)
+        return [self.terms[i] for i in np.argsort(-weights, kind="stable")[:k]]
+
+    def top(self, count: int, start: float = 0.0, end: float = 1.0, exclude=(),
+            predicate: Optional[Callable[[str], bool]] = None, max_overlap: float = 0.6) -> List[int]:
+        """Indices of up to `count` best-ranked sentences, best first.
+
+        Only sentences whose relative position in the document is in
+        [start, end) are considered. A sentence sharing more than max_overlap
+        of its terms (Jaccard) with one already picked is skipped.
+        """
+        n = len(self.sentences)
+        if not self.scores.any() or count <= 0:
+            return []
+
+        first, last = int(start * n), max(int(start * n) + 1, int(end * n))
+        candidates = np.arange(first, min(last, n))
+        ordered = candidates[np.argsort(-self.scores[candidates], kind="stable")]
+
+        excluded = set(exclude)
+        picked: List[int] = []
+        picked_terms: List[frozenset] = []
+        for i in ordered:
+            i = int(i)
+            if i in excluded or (predicate is not None and not predicate(self.sentences[i])):
+                continue
+            terms = self._term_set(i)
+            if any(len(terms & other) > max_overlap * len(terms | other) for other in picked_terms):
+                continue
+            picked.append(i)
+            picked_terms.append(terms)
+            if len(picked) == count:
+                break
+        return picked
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import logging
+import math
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlite_tier import SQLiteTier
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+
+class QueueFull(Exception):
+    """The job queue already holds max_queued jobs"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Job queue is full")
+        self.retry_after = retry_after
+
+
+def new_job(stages: List[str], **fields) -> Dict[str, Any]:
+    """Fresh job record with every stage pending"""
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "status": QUEUED,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "stages": {stage: {"status": "pending"} for stage in stages},
+        "result": None,
+        "error": None
+    }
+    job.update(fields)
+    return job
+
+
+class JobBackend:
+    """Where job records live. Subclasses only need to store and load dicts"""
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def fail_unfinished(self, reason: str) -> int:
+        """Mark jobs left queued/running by a previous process as failed"""
+        return 0
+
+
+class InMemoryJobBackend(JobBackend):
+    """Job records in a dict, dropping the oldest finished jobs past max_jobs"""
+
+    def __init__(self, max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        self.jobs[job["job_id"]] = job
+        if len(self.jobs) > self.max_jobs:
+            for job_id in [job_id for job_id, old in self.jobs.items() if old["status"] in FINISHED]:
+                del self.jobs[job_id]
+                if len(self.jobs) <= self.max_jobs:
+                    break
+
+    async def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(job_id)
+
+
+class SQLiteJobBackend(JobBackend):
+    """Job records as JSON rows in SQLite, so status survives a restart.
+
+    Writes take turns, and each one serializes the job as it is when its
+    turn comes, so a slow write can never overwrite a newer state of the
+    same job.
+    """
+
+    def __init__(self, path: str):
+        self.db = SQLiteTier(path, ["CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, status TEXT, data TEXT)"])
+        self.write_turn: Optional[asyncio.Lock] = None
+
+    @staticmethod
+    def _write(db: sqlite3.Connection, job_id: str, status: str, data: str) -> None:
+        db.execute("INSERT OR REPLACE INTO jobs (job_id, status, data) VALUES (?, ?, ?)", (job_id, status, data))
+        db.commit()
+
+    @staticmethod
+    def _read(db: sqlite3.Connection, job_id: str) -> Optional[tuple]:
+        return db.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+
+    @staticmethod
+    def _read_unfinished(db: sqlite3.Connection) -> List[tuple]:
+        return db.execute("SELECT data FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        if self.write_turn is None:
+            self.write_turn = asyncio.Lock()
+        async with self.write_turn:
+            await self.db.run(self._write, job["job_id"], job["status"], json.dumps(job))
+
+    async def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = await self.db.run(self._read, job_id)
+        return json.loads(row[0]) if row else None
+
+    async def fail_unfinished(self, reason: str) -> int:
+        rows = await self.db.run(self._read_unfinished)
+        for (data,) in rows:
+            job = json.loads(data)
+            job.update(status=FAILED, error=reason, finished_at=time.time())
+            await self.save(job)
+        return len(rows)
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class JobContext:
+    """Handed to a job handler so it can report per-stage progress.
+
+    progress() may be called from plain callbacks, so it saves in the
+    background, at most one save per job at a time; updates made while one
+    is in flight are picked up by the next save.
+    """
+
+    def __init__(self, queue: "JobQueue", job: Dict[str, Any]):
+        self.queue = queue
+        self.job = job
+        self.pending_save: Optional[asyncio.Future] = None
+
+    async def start_stage(self, stage: str) -> None:
+        self.job["stages"][stage] = {"status": RUNNING, "started_at": time.time()}
+        await self.queue.backend.save(self.job)
+
+    def progress(self, stage: str, done: int, total: int) -> None:
+        self.job["stages"][stage].update(done=done, total=total)
+        if self.pending_save is None or self.pending_save.done():
+            self.pending_save = asyncio.ensure_future(self.queue.backend.save(self.job))
+
+    async def finish_stage(self, stage: str, **details) -> None:
+        record = self.job["stages"][stage]
+        record.update(status=SUCCEEDED, finished_at=time.time(), **details)
+        if record.get("started_at"):
+            record["elapsed_ms"] = round((record["finished_at"] - record["started_at"]) * 1000, 1)
+        await self.queue.backend.save(self.job)
+
+    async def skip_stage(self, stage: str) -> None:
+        self.job["stages"][stage] = {"status": "skipped"}
+        await self.queue.backend.save(self.job)
+
+
+JobHandler = Callable[[JobContext], Awaitable[Any]]
+
+
+class JobQueue:
+    """In-process queue drained by a fixed number of asyncio worker tasks.
+
+    The number of workers bounds how many heavy jobs run at once; anything
+    beyond that waits in the queue with status "queued", up to max_queued
+    jobs (0 for no limit) after which submit() raises QueueFull.
+    """
+
+    def __init__(self, backend: JobBackend, workers: int = 2, max_queued: int = 0):
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+        self.average_seconds = 10.0
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    @property
+    def full(self) -> bool:
+        return self.max_queued > 0 and self.depth >= self.max_queued
+
+    def retry_after(self) -> int:
+        """Seconds until a queued job should have started, from how long jobs take"""
+        return min(300, max(1, math.ceil(self.average_seconds)))
+
+    def start(self) -> None:
+        if self.tasks:
+            return
+        self.queue = asyncio.Queue()
+        self.tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        # Jobs no worker picked up still hold their uploads
+        while self.queue is not None and not self.queue.empty():
+            job, handler, cleanup = self.queue.get_nowait()
+            job.update(status=FAILED, error="Server shut down before the job started", finished_at=time.time())
+            try:
+                await self.backend.save(job)
+            finally:
+                if cleanup is not None:
+                    cleanup()
+        self.tasks = []
+        self.queue = None
+
+    async def submit(self, job: Dict[str, Any], handler: JobHandler,
+                     cleanup: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Record a job and queue its handler; cleanup runs once the job ends either way.
+
+        Raises QueueFull (without running cleanup) when max_queued jobs are waiting.
+        """
+        self.start()
+        if self.full:
+            raise QueueFull(self.retry_after())
+        self.queue.put_nowait((job, handler, cleanup))
+        await self.backend.save(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.backend.load(job_id)
+
+    async def _worker(self, worker_number: int) -> None:
+        while True:
+            job, handler, cleanup = await self.queue.get()
+            job.update(status=RUNNING, started_at=time.time())
+            await self.backend.save(job)
+            try:
+                job["result"] = await handler(JobContext(self, job))
+                job["status"] = SUCCEEDED
+            except asyncio.CancelledError:
+                job.update(status=FAILED, error="Server shut down before the job finished")
+                raise
+            except Exception as e:
+                logger.error(f"Job {job['job_id']} failed: {str(e)}")
+                job.update(status=FAILED, error=getattr(e, "detail", None) or str(e))
+                for record in job["stages"].values():
+                    if record.get("status") == RUNNING:
+                        record["status"] = FAILED
+            finally:
+                job["finished_at"] = time.time()
+                self.average_seconds += 0.1 * ((job["finished_at"] - job["started_at"]) - self.average_seconds)
+                try:
+                    await self.backend.save(job)
+                finally:
+                    if cleanup is not None:
+                        cleanup()
+                    self.queue.task_done()
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlite_tier import SQLiteTier
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(models: List[str], prompt: str, max_tokens: int, temperature: float, top_p: float) -> str:
+    """Hash of everything that determines an LLM response.
+
+    `models` is the list the call may be routed to, so a change to the model
+    list does not serve answers produced by models that are no longer used.
+    """
+    material = json.dumps(
+        {"models": list(models), "prompt": prompt, "max_tokens": max_tokens,
+         "temperature": temperature, "top_p": top_p},
+        sort_keys=True
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LLM responses with TTL expiry.
+
+    A bounded in-memory LRU sits in front of an optional SQLite table so
+    entries survive restarts.
+    """
+
+    def __init__(self, max_items: int = 1024, ttl_seconds: float = 86400, db_path: Optional[str] = None):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._db: Optional[SQLiteTier] = None
+        self._writes_since_purge = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.db_path:
+            self._db = SQLiteTier(self.db_path, [
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created_at REAL, content TEXT)"
+            ])
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries)
+        }
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return a fresh cached response or None"""
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            created_at, content = entry
+            if now - created_at <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return content
+            del self._entries[key]
+
+        if self._db is not None:
+            row = await self._db.run(self._db_get, key)
+            if row is not None and now - row[0] <= self.ttl_seconds:
+                self._remember(key, row[0], row[1])
+                self.disk_hits += 1
+                return row[1]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, content: str) -> None:
+        """Store a response in memory and, if configured, in SQLite"""
+        created_at = time.time()
+        self._remember(key, created_at, content)
+
+        if self._db is not None:
+            try:
+                await self._db.run(self._db_set, key, created_at, content)
+            except Exception as e:
+                logger.warning(f"Could not persist cached LLM response: {str(e)}")
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key: str, created_at: float, content: str) -> None:
+        self._entries[key] = (created_at, content)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _db_get(db: sqlite3.Connection, key: str) -> Optional[Tuple[float, str]]:
+        return db.execute("SELECT created_at, content FROM responses WHERE key = ?", (key,)).fetchone()
+
+    def _db_set(self, db: sqlite3.Connection, key: str, created_at: float, content: str) -> None:
+        db.execute(
+            "INSERT OR REPLACE INTO responses (key, created_at, content) VALUES (?, ?, ?)",
+            (key, created_at, content)
+        )
+        self._writes_since_purge += 1
+        if self._writes_since_purge >= 100:
+            # Drop expired rows now and then so the table doesn't grow forever
+            db.execute("DELETE FROM responses WHERE created_at < ?", (created_at - self.ttl_seconds,))
+            self._writes_since_purge = 0
+        db.commit()
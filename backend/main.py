@@ -1,13 +1,37 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-import PyPDF2
+from fastapi.responses import Response, StreamingResponse
 import os
-import io
 import re
+import json
+import math
+import time
+import multiprocessing
+import zlib
+import asyncio
 import httpx
-from typing import List
+from typing import AsyncIterator, List, Optional, Tuple
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from concurrent.futures import ProcessPoolExecutor
 import logging
 from dotenv import load_dotenv
+from admission import AdmissionController, Overloaded, PriorityClass
+from chunking import PAGE_BREAK, ChunkAccumulator, PageChunkAccumulator, chunk_pages, chunk_text, chunk_token_budget, estimate_tokens
+from document_store import DocumentStore, is_valid_doc_id
+from extractive import SentenceRanker
+from jobs import InMemoryJobBackend, JobContext, JobQueue, QueueFull, SQLiteJobBackend, new_job
+from llm_cache import ResponseCache, make_cache_key
+import metrics
+from page_cache import PageTextCache
+from model_router import ModelRouter, jittered_backoff, parse_retry_after
+from near_duplicates import MinHasher, NearDuplicateIndex, SectionSketchStore
+from normalize import PageNormalizer, normalize_pages
+from rate_limiter import RateLimiter, SingleFlight
+from retrieval import PassageIndex
+from revisions import RevisionStore, content_hash, count_changed_pages, page_hashes
+from uploads import RequestBodyLimit, UploadTooLarge, spool_upload, spool_zip_members, remove_quietly
+import pdf_extraction
 
 # Load environment variables
 load_dotenv()
@@ -16,7 +40,42 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="PDF Summarizer API with Groq", version="1.0.0")
+def env_flag(name: str, default: bool) -> bool:
+    """Boolean setting from the environment: 1, true or yes (any case) turn it on"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Set up the shared HTTP client, extraction pool and job workers for the app's lifetime.
+
+    On shutdown the SQLite files behind the caches are closed too.
+    """
+    global http_client, extraction_pool
+    http_client = create_http_client()
+    extraction_pool = create_extraction_pool()
+    interrupted = await job_backend.fail_unfinished("Server restarted before the job finished")
+    if interrupted:
+        logger.warning(f"Marked {interrupted} unfinished jobs from a previous run as failed")
+    job_queue.start()
+    try:
+        yield
+    finally:
+        await job_queue.stop()
+        if isinstance(job_backend, SQLiteJobBackend):
+            job_backend.close()
+        await http_client.aclose()
+        http_client = None
+        if extraction_pool is not None:
+            extraction_pool.shutdown(cancel_futures=True)
+            extraction_pool = None
+        for store in (response_cache, page_cache, revision_store, section_sketches):
+            if store is not None:
+                store.close()
+
+app = FastAPI(title="PDF Summarizer API with Groq", version="1.0.0", lifespan=lifespan)
 
 # CORS Setup
 app.add_middleware(
@@ -36,173 +95,926 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")  # Add this to your .env file
 if not GROQ_API_KEY:
     logger.warning("GROQ_API_KEY not found! Get one free at groq.com")
 
-def extract_text_from_pdf(pdf_file) -> str:
-    """Extract text from PDF with better error handling"""
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+
+# Free Groq models (super fast!), in order of preference
+GROQ_MODELS = [
+    "llama3-70b-8192",     # Better quality for detailed summaries
+    "llama3-8b-8192",      # Fast and good
+    "mixtral-8x7b-32768",  # Good alternative
+    "gemma-7b-it"          # Another option
+]
+
+# Model routing - per-model health, rate limit windows and circuit breakers
+ROUTER_FAILURE_THRESHOLD = int(os.getenv("ROUTER_FAILURE_THRESHOLD", "3"))
+ROUTER_OPEN_SECONDS = float(os.getenv("ROUTER_OPEN_SECONDS", "30"))
+ROUTER_DEFAULT_RETRY_AFTER = float(os.getenv("ROUTER_DEFAULT_RETRY_AFTER", "10"))
+ROUTER_MAX_ATTEMPTS = int(os.getenv("ROUTER_MAX_ATTEMPTS", "6"))
+ROUTER_MAX_WAIT = float(os.getenv("ROUTER_MAX_WAIT", "20"))  # Longest we wait for a model to free up
+ROUTER_BACKOFF_BASE = float(os.getenv("ROUTER_BACKOFF_BASE", "0.5"))
+ROUTER_BACKOFF_MAX = float(os.getenv("ROUTER_BACKOFF_MAX", "8"))
+
+model_router = ModelRouter(
+    GROQ_MODELS,
+    failure_threshold=ROUTER_FAILURE_THRESHOLD,
+    open_seconds=ROUTER_OPEN_SECONDS,
+    default_retry_after=ROUTER_DEFAULT_RETRY_AFTER
+)
+
+# Client-side rate limiting - requests/min and tokens/min per model, kept just under Groq's limits
+RATE_LIMIT_ENABLED = env_flag("RATE_LIMIT_ENABLED", True)
+RATE_LIMIT_RPM = float(os.getenv("RATE_LIMIT_RPM", "30"))
+RATE_LIMIT_TPM = float(os.getenv("RATE_LIMIT_TPM", "6000"))
+RATE_LIMIT_MODEL_LIMITS = json.loads(os.getenv("RATE_LIMIT_MODEL_LIMITS", "{}"))  # {"model": [rpm, tpm]}
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "60"))
+
+rate_limiter = RateLimiter(
+    (RATE_LIMIT_RPM, RATE_LIMIT_TPM),
+    {model: tuple(limits) for model, limits in RATE_LIMIT_MODEL_LIMITS.items()}
+) if RATE_LIMIT_ENABLED else None
+single_flight = SingleFlight()
+
+# Outbound HTTP client - pooled and kept alive so LLM calls skip the TCP+TLS handshake
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+GROQ_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GROQ_MAX_KEEPALIVE_CONNECTIONS", "10"))
+GROQ_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "30.0"))
+GROQ_HTTP2 = env_flag("GROQ_HTTP2", False)
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5.0"))
+GROQ_READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "60.0"))
+GROQ_WRITE_TIMEOUT = float(os.getenv("GROQ_WRITE_TIMEOUT", "10.0"))
+GROQ_POOL_TIMEOUT = float(os.getenv("GROQ_POOL_TIMEOUT", "10.0"))
+
+http_client: Optional[httpx.AsyncClient] = None
+
+# LLM response cache - identical prompts (e.g. re-uploaded documents) skip the API
+LLM_CACHE_ENABLED = env_flag("LLM_CACHE_ENABLED", True)
+LLM_CACHE_MAX_ITEMS = int(os.getenv("LLM_CACHE_MAX_ITEMS", "2048"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))  # Seconds
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB")  # Optional SQLite file for persistence
+
+response_cache = ResponseCache(
+    max_items=LLM_CACHE_MAX_ITEMS,
+    ttl_seconds=LLM_CACHE_TTL,
+    db_path=LLM_CACHE_DB
+) if LLM_CACHE_ENABLED else None
+
+# PDF extraction - CPU-bound, so it runs in worker processes off the event loop
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(os.cpu_count() or 1)))  # 0 = use a thread
+EXTRACTION_PAGES_PER_TASK = int(os.getenv("EXTRACTION_PAGES_PER_TASK", "25"))
+# pypdf2 (default), pypdfium2 or pdfminer when installed, or auto for the fastest installed one
+EXTRACTION_ENGINE = pdf_extraction.resolve_engine(os.getenv("EXTRACTION_ENGINE", pdf_extraction.DEFAULT_ENGINE))
+
+# Extracted text per (document hash, page) - interrupted or re-uploaded documents skip pages already done
+PAGE_CACHE_ENABLED = env_flag("PAGE_CACHE_ENABLED", True)
+PAGE_CACHE_MAX_MB = int(os.getenv("PAGE_CACHE_MAX_MB", "128"))
+PAGE_CACHE_DB = os.getenv("PAGE_CACHE_DB", "")  # e.g. page_cache.sqlite; empty = memory only
+PAGE_CACHE_DB_MAX_DOCUMENTS = int(os.getenv("PAGE_CACHE_DB_MAX_DOCUMENTS", "1000"))
+
+page_cache = PageTextCache(
+    max_bytes=PAGE_CACHE_MAX_MB * 1024 * 1024,
+    db_path=PAGE_CACHE_DB or None,
+    max_db_documents=PAGE_CACHE_DB_MAX_DOCUMENTS
+) if PAGE_CACHE_ENABLED else None
+
+extraction_pool: Optional[ProcessPoolExecutor] = None
+
+# Uploads are streamed to temp files with this hard limit
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "25"))
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR")  # Defaults to the system temp dir
+
+# Background jobs for large documents - JOB_WORKERS bounds how many run at once
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_BACKEND = os.getenv("JOB_BACKEND", "memory").lower()  # memory or sqlite
+JOB_DB = os.getenv("JOB_DB", "jobs.sqlite")
+JOB_MAX_RECORDS = int(os.getenv("JOB_MAX_RECORDS", "1000"))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "100"))  # Waiting jobs before POST /jobs returns 503; 0 for no limit
+
+job_backend = SQLiteJobBackend(JOB_DB) if JOB_BACKEND == "sqlite" else InMemoryJobBackend(JOB_MAX_RECORDS)
+job_queue = JobQueue(job_backend, workers=JOB_WORKERS, max_queued=JOB_MAX_QUEUED)
+
+# Admission control - requests are admitted by estimated cost (pages, from the upload
+# size and the pages asked for) so that bursts queue or are shed with a 503 instead of
+# piling up. Interactive requests (/ask) are served before bulk ones (/process),
+# and bulk requests only get ADMISSION_BULK_SHARE of the capacity. Background jobs
+# count as bulk but, being accepted already, wait for as long as it takes.
+ADMISSION_ENABLED = env_flag("ADMISSION_ENABLED", True)
+ADMISSION_CAPACITY_PAGES = float(os.getenv("ADMISSION_CAPACITY_PAGES", "2000"))
+ADMISSION_BYTES_PER_PAGE = int(os.getenv("ADMISSION_BYTES_PER_PAGE", "10000"))
+ADMISSION_BULK_SHARE = float(os.getenv("ADMISSION_BULK_SHARE", "0.8"))
+ADMISSION_INTERACTIVE_MAX_WAIT = float(os.getenv("ADMISSION_INTERACTIVE_MAX_WAIT", "5"))  # Seconds in the queue
+ADMISSION_BULK_MAX_WAIT = float(os.getenv("ADMISSION_BULK_MAX_WAIT", "30"))
+ADMISSION_MAX_QUEUED = int(os.getenv("ADMISSION_MAX_QUEUED", "50"))  # Per class
+admission = AdmissionController(ADMISSION_CAPACITY_PAGES, [
+    PriorityClass("interactive", max_wait=ADMISSION_INTERACTIVE_MAX_WAIT, max_queued=ADMISSION_MAX_QUEUED),
+    PriorityClass("bulk", ADMISSION_BULK_SHARE, ADMISSION_BULK_MAX_WAIT, ADMISSION_MAX_QUEUED)
+]) if ADMISSION_ENABLED else None
+
+# Batch processing - every LLM call in a batch shares one concurrency budget
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+# Bytes written to disk for one batch, after unzipping, and the highest compression
+# ratio accepted for a PDF inside a zip (zip bombs expand far beyond this)
+BATCH_MAX_TOTAL_MB = int(os.getenv("BATCH_MAX_TOTAL_MB", "500"))
+BATCH_MAX_TOTAL_BYTES = BATCH_MAX_TOTAL_MB * 1024 * 1024
+BATCH_MAX_COMPRESSION_RATIO = float(os.getenv("BATCH_MAX_COMPRESSION_RATIO", "50"))
+
+# Room for form fields and multipart boundaries on top of the file limits
+REQUEST_BODY_OVERHEAD_BYTES = 1024 * 1024
+
+def request_body_limit(path: str) -> int:
+    """Largest request body a route accepts, enforced while it streams in"""
+    limit = BATCH_MAX_TOTAL_BYTES if path == "/process/batch" else MAX_UPLOAD_BYTES
+    return limit + REQUEST_BODY_OVERHEAD_BYTES
+
+app.add_middleware(RequestBodyLimit, limit_for=request_body_limit)
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+# Documents of one batch being processed or waiting for admission at once
+BATCH_DOCUMENT_CONCURRENCY = max(1, int(os.getenv("BATCH_DOCUMENT_CONCURRENCY", "4")))
+
+# Extracted document cache - lets /ask reuse a doc_id instead of re-uploading
+DOC_CACHE_MAX_ITEMS = int(os.getenv("DOC_CACHE_MAX_ITEMS", "64"))
+DOC_CACHE_MAX_MB = int(os.getenv("DOC_CACHE_MAX_MB", "256"))
+DOC_CACHE_DIR = os.getenv("DOC_CACHE_DIR")  # Optional on-disk tier
+DOC_CACHE_DISK_MAX_ITEMS = int(os.getenv("DOC_CACHE_DISK_MAX_ITEMS", "10000"))
+DOC_CACHE_DISK_MAX_MB = int(os.getenv("DOC_CACHE_DISK_MAX_MB", "4096"))
+
+# Map-reduce summarization - how many chunk summaries may be in flight at once
+SUMMARY_CONCURRENCY = max(1, int(os.getenv("SUMMARY_CONCURRENCY", "4")))
+SUMMARY_MAX_RETRIES = int(os.getenv("SUMMARY_MAX_RETRIES", "2"))
+SUMMARY_RETRY_DELAY = float(os.getenv("SUMMARY_RETRY_DELAY", "2.0"))  # Seconds, doubles per retry
+SUMMARY_REDUCE_MAX_CHARS = int(os.getenv("SUMMARY_REDUCE_MAX_CHARS", "12000"))
+
+# Chunks are sized in estimated tokens against the smallest routable context window,
+# capped so a single request stays well inside per-minute token limits
+SUMMARY_CHUNK_MAX_TOKENS = int(os.getenv("SUMMARY_CHUNK_MAX_TOKENS", "4000"))
+SUMMARY_CHUNK_OVERLAP_TOKENS = int(os.getenv("SUMMARY_CHUNK_OVERLAP_TOKENS", "0"))
+# "text": sentence-level packing into the fewest, fullest chunks; "pages": whole pages
+# per chunk with content-defined boundaries, so unchanged pages of a revised document
+# give the same chunks again (about a quarter more chunks). /process uses "pages" for
+# a request with previous_doc_id or track_revisions=true whatever this is set to
+SUMMARY_CHUNKING = os.getenv("SUMMARY_CHUNKING", "text").lower()
+# With "pages", a page (or section summary in the reduce step) whose hash is
+# divisible by this always ends a chunk (or reduce group)
+SUMMARY_ANCHOR_EVERY = int(os.getenv("SUMMARY_ANCHOR_EVERY", "8"))
+
+# Extractive fallback summary (used when the LLM is unavailable) - the overview is
+# taken from the opening share of the document and conclusions from the closing share
+FALLBACK_KEY_POINTS = int(os.getenv("FALLBACK_KEY_POINTS", "5"))
+FALLBACK_OPENING_SHARE = float(os.getenv("FALLBACK_OPENING_SHARE", "0.1"))
+FALLBACK_CLOSING_SHARE = float(os.getenv("FALLBACK_CLOSING_SHARE", "0.15"))
+
+# Near-duplicate sections (MinHash over word shingles) within a document are summarized
+# once and the summary reused. Across documents only exact chunks are reused (by content
+# hash, see Revisions below). SECTION_SKETCH_ENABLED=true also lets a near-identical
+# section of an earlier document stand in, but that store is shared by every upload and
+# client: the reused summary comes from someone else's text, with their names and
+# figures, so only enable it when all uploads come from one trusted source
+NEAR_DUPLICATE_ENABLED = env_flag("NEAR_DUPLICATE_ENABLED", True)
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))  # Estimated Jaccard similarity
+SECTION_SKETCH_ENABLED = env_flag("SECTION_SKETCH_ENABLED", False)
+SECTION_SKETCH_THRESHOLD = float(os.getenv("SECTION_SKETCH_THRESHOLD", "0.95"))  # Across documents
+SECTION_SKETCH_MAX_ENTRIES = int(os.getenv("SECTION_SKETCH_MAX_ENTRIES", "10000"))
+SECTION_SKETCH_DB = os.getenv("SECTION_SKETCH_DB")  # Optional SQLite file for persistence
+SECTION_SKETCH_DB_MAX_ENTRIES = int(os.getenv("SECTION_SKETCH_DB_MAX_ENTRIES", "100000"))
+
+minhasher = MinHasher()
+section_sketches = SectionSketchStore(
+    max_entries=SECTION_SKETCH_MAX_ENTRIES,
+    threshold=SECTION_SKETCH_THRESHOLD,
+    db_path=SECTION_SKETCH_DB,
+    max_db_entries=SECTION_SKETCH_DB_MAX_ENTRIES
+) if NEAR_DUPLICATE_ENABLED and SECTION_SKETCH_ENABLED else None
+
+# Revisions - page hashes of processed documents and section summaries by chunk
+# hash, so a re-uploaded revision only re-summarizes the chunks whose pages changed
+REVISIONS_ENABLED = env_flag("REVISIONS_ENABLED", True)
+REVISION_MAX_DOCUMENTS = int(os.getenv("REVISION_MAX_DOCUMENTS", "1000"))
+REVISION_MAX_SUMMARIES = int(os.getenv("REVISION_MAX_SUMMARIES", "20000"))
+REVISION_DB = os.getenv("REVISION_DB")  # Optional SQLite file for persistence
+REVISION_DB_MAX_DOCUMENTS = int(os.getenv("REVISION_DB_MAX_DOCUMENTS", "100000"))
+REVISION_DB_MAX_SUMMARIES = int(os.getenv("REVISION_DB_MAX_SUMMARIES", "200000"))
+
+revision_store = RevisionStore(
+    max_documents=REVISION_MAX_DOCUMENTS,
+    max_summaries=REVISION_MAX_SUMMARIES,
+    db_path=REVISION_DB,
+    max_db_documents=REVISION_DB_MAX_DOCUMENTS,
+    max_db_summaries=REVISION_DB_MAX_SUMMARIES
+) if REVISIONS_ENABLED else None
+
+# Streamed pages (incremental /process) are held back until this many have been
+# seen, so running headers and footers can be recognized before anything is chunked
+NORMALIZE_WARMUP_PAGES = max(1, int(os.getenv("NORMALIZE_WARMUP_PAGES", "5")))
+
+# Retrieval for /ask - the prompt gets the best matching passages, not the first page
+PASSAGE_MAX_TOKENS = int(os.getenv("PASSAGE_MAX_TOKENS", "250"))
+ANSWER_CONTEXT_TOKENS = int(os.getenv("ANSWER_CONTEXT_TOKENS", "1500"))
+ANSWER_TOP_K = int(os.getenv("ANSWER_TOP_K", "8"))
+
+# Several questions per /ask - answered in one prompt when their passages fit the budget
+ASK_MAX_QUESTIONS = int(os.getenv("ASK_MAX_QUESTIONS", "20"))
+ANSWER_BATCH_MAX_QUESTIONS = int(os.getenv("ANSWER_BATCH_MAX_QUESTIONS", "5"))
+ANSWER_BATCH_CONTEXT_TOKENS = int(os.getenv("ANSWER_BATCH_CONTEXT_TOKENS", "3000"))
+ANSWER_BATCH_TOKENS_PER_QUESTION = int(os.getenv("ANSWER_BATCH_TOKENS_PER_QUESTION", "350"))
+
+document_store = DocumentStore(
+    max_items=DOC_CACHE_MAX_ITEMS,
+    max_bytes=DOC_CACHE_MAX_MB * 1024 * 1024,
+    disk_dir=DOC_CACHE_DIR,
+    max_disk_items=DOC_CACHE_DISK_MAX_ITEMS,
+    max_disk_bytes=DOC_CACHE_DISK_MAX_MB * 1024 * 1024
+)
+
+# Metrics exposed on /metrics. DEBUG_TIMINGS adds per-request timing spans to
+# responses (a Server-Timing header, and a "spans" list on /process and /ask)
+DEBUG_TIMINGS = env_flag("DEBUG_TIMINGS", False)
+
+HTTP_IN_FLIGHT = metrics.gauge("pdf_http_requests_in_flight", "Requests currently being handled")
+HTTP_DURATION = metrics.histogram(
+    "pdf_http_request_duration_seconds", "Time until the response headers were sent",
+    ["method", "path", "status"], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+EXTRACTION_SECONDS = metrics.histogram(
+    "pdf_extraction_seconds", "Time to extract the text of one PDF",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+EXTRACTION_PAGES_PER_SECOND = metrics.histogram(
+    "pdf_extraction_pages_per_second", "Extraction throughput per PDF",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+SUMMARY_CHUNKS = metrics.histogram(
+    "pdf_summary_chunks", "Chunks per summarized document",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500)
+)
+LLM_LATENCY = metrics.histogram(
+    "pdf_llm_request_seconds", "Latency of successful LLM calls (time to first token for streams)",
+    ["model"], buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+)
+LLM_REQUESTS = metrics.counter("pdf_llm_requests_total", "LLM calls by model and outcome", ["model", "outcome"])
+LLM_RATE_LIMITS = metrics.counter("pdf_llm_rate_limited_total", "429 responses by model", ["model"])
+SUMMARIES = metrics.counter("pdf_summaries_total", "Summaries by source (llm or fallback)", ["source"])
+ANSWERS = metrics.counter("pdf_answers_total", "Answers by source (llm or fallback)", ["source"])
+LLM_CACHE_LOOKUPS = metrics.counter("pdf_llm_cache_lookups_total", "LLM response cache lookups by result", ["result"])
+PAGE_CACHE_LOOKUPS = metrics.counter("pdf_page_cache_lookups_total", "Extracted page cache lookups by result", ["result"])
+DOC_CACHE_LOOKUPS = metrics.counter("pdf_document_cache_lookups_total", "Document cache lookups by result", ["result"])
+SECTIONS_REUSED = metrics.counter(
+    "pdf_sections_reused_total", "Section summaries reused instead of calling the LLM, by source", ["source"]
+)
+JOB_QUEUE_DEPTH = metrics.gauge("pdf_job_queue_depth", "Jobs waiting for a worker")
+JOBS_SHED = metrics.counter("pdf_jobs_shed_total", "Jobs rejected with 503 because JOB_MAX_QUEUED were waiting")
+ADMISSION_QUEUE_DEPTH = metrics.gauge("pdf_admission_queue_depth", "Requests waiting for admission, by class", ["priority"])
+ADMISSION_IN_FLIGHT = metrics.gauge("pdf_admission_in_flight_pages", "Estimated pages of the admitted requests still running")
+ADMISSION_WAIT = metrics.histogram(
+    "pdf_admission_wait_seconds", "Time admitted requests waited in the queue", ["priority"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+ADMISSION_SHED = metrics.counter(
+    "pdf_admission_shed_total", "Requests rejected with 503 by admission control, by class and reason", ["priority", "reason"]
+)
+
+for result, stat in (("memory_hit", "memory_hits"), ("disk_hit", "disk_hits"), ("miss", "misses")):
+    LLM_CACHE_LOOKUPS.labels(result).set_function(
+        lambda stat=stat: getattr(response_cache, stat) if response_cache is not None else 0
+    )
+PAGE_CACHE_LOOKUPS.labels("hit").set_function(lambda: page_cache.page_hits if page_cache is not None else 0)
+PAGE_CACHE_LOOKUPS.labels("miss").set_function(lambda: page_cache.page_misses if page_cache is not None else 0)
+DOC_CACHE_LOOKUPS.labels("hit").set_function(lambda: document_store.hits)
+DOC_CACHE_LOOKUPS.labels("miss").set_function(lambda: document_store.misses)
+JOB_QUEUE_DEPTH.set_function(lambda: job_queue.depth)
+if admission is not None:
+    for priority in admission.classes:
+        ADMISSION_QUEUE_DEPTH.labels(priority).set_function(lambda priority=priority: admission.queued(priority))
+    ADMISSION_IN_FLIGHT.set_function(lambda: admission.in_flight)
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build the pooled client used for all Groq calls"""
+    http2 = GROQ_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("GROQ_HTTP2 is set but the h2 package is not installed, using HTTP/1.1")
+            http2 = False
+    
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(
+            connect=GROQ_CONNECT_TIMEOUT,
+            read=GROQ_READ_TIMEOUT,
+            write=GROQ_WRITE_TIMEOUT,
+            pool=GROQ_POOL_TIMEOUT
+        ),
+        limits=httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=GROQ_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=GROQ_KEEPALIVE_EXPIRY
+        )
+    )
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily when running outside the app lifespan"""
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = create_http_client()
+    return http_client
+
+def create_extraction_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool for CPU-bound PDF parsing, or None to extract in a thread.
+
+    Workers are started with forkserver (spawn where that is unavailable):
+    forking a server that already runs threads can copy held locks into
+    the child and deadlock it.
+    """
+    if EXTRACTION_WORKERS <= 0:
+        return None
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS, mp_context=multiprocessing.get_context(method))
+
+def get_extraction_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the shared extraction pool, creating it lazily outside the app lifespan"""
+    global extraction_pool
+    if extraction_pool is None and EXTRACTION_WORKERS > 0:
+        extraction_pool = create_extraction_pool()
+    return extraction_pool
+
+PageSelection = List[Tuple[int, Optional[int]]]
+
+async def iter_pdf_pages(pdf_path: str, doc_id: Optional[str] = None,
+                         page_selection: Optional[PageSelection] = None) -> AsyncIterator[str]:
+    """Yield the text of each selected, non-empty page in page order as it is extracted.
+
+    Parsing runs in the extraction process pool so it never blocks the event
+    loop; the missing pages are split into ranges of EXTRACTION_PAGES_PER_TASK
+    that are all extracted in parallel, and pages are yielded as soon as the
+    range holding them is done, so callers can start working on early pages
+    while later ones are still being parsed. With a doc_id, pages already in
+    the page cache are not extracted again and each range is cached as soon
+    as it is done. Pages outside page_selection are never extracted.
+    """
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    pool = get_extraction_pool()
+    engine = EXTRACTION_ENGINE
+    use_cache = page_cache is not None and doc_id is not None
+    tasks = []
+    
+    async def extract_range(start: int, end: int) -> dict:
+        page_texts = await loop.run_in_executor(
+            pool, pdf_extraction.extract_page_range, pdf_path, start, end, engine
+        )
+        extracted = {start + i: page_text for i, page_text in enumerate(page_texts)}
+        if use_cache:
+            await page_cache.put_pages(doc_id, engine, page_count, extracted)
+        return extracted
+    
     try:
-        # Reset file pointer to beginning
-        pdf_file.seek(0)
+        page_count, pages = await page_cache.get_pages(doc_id, engine) if use_cache else (None, {})
+        if page_count is None:
+            page_count = await loop.run_in_executor(pool, pdf_extraction.count_pages, pdf_path, engine)
         
-        # Read the file content
-        pdf_content = pdf_file.read()
-        pdf_file_obj = io.BytesIO(pdf_content)
+        if page_count == 0:
+            raise ValueError("PDF has no pages")
         
-        pdf_reader = PyPDF2.PdfReader(pdf_file_obj)
+        wanted = (
+            pdf_extraction.select_pages(page_selection, page_count) if page_selection
+            else list(range(page_count))
+        )
+        if not wanted:
+            raise ValueError(f"The requested pages are not in the document ({page_count} pages)")
         
-        if len(pdf_reader.pages) == 0:
-            raise ValueError("PDF has no pages")
+        page_ranges = pdf_extraction.missing_page_ranges(page_count, pages, EXTRACTION_PAGES_PER_TASK, wanted)
+        missing = sum(end - start for start, end in page_ranges)
+        if use_cache:
+            page_cache.record_lookup(len(wanted) - missing, missing)
         
-        # Extract text from all pages
-        text_parts = []
-        for i, page in enumerate(pdf_reader.pages):
-            try:
-                page_text = page.extract_text()
-                if page_text and page_text.strip():
-                    text_parts.append(page_text.strip())
-                logger.info(f"Extracted text from page {i+1}")
-            except Exception as e:
-                logger.warning(f"Could not extract text from page {i+1}: {str(e)}")
-                continue
+        # Start every range now; they are awaited in page order below
+        tasks = [asyncio.ensure_future(extract_range(start, end)) for start, end in page_ranges]
         
-        if not text_parts:
-            raise ValueError("No text could be extracted from the PDF")
+        yielded = 0
+        characters = 0
+        next_task = 0
+        for page in wanted:
+            while page not in pages and next_task < len(tasks):
+                pages.update(await tasks[next_task])
+                next_task += 1
+            if pages.get(page):
+                yielded += 1
+                characters += len(pages[page])
+                yield pages[page]
         
-        full_text = "\n".join(text_parts)
-        logger.info(f"Total extracted text length: {len(full_text)} characters")
+        if not yielded:
+            raise ValueError("No text could be extracted from the PDF")
         
-        return full_text
+        seconds = time.perf_counter() - started
+        EXTRACTION_SECONDS.observe(seconds)
+        EXTRACTION_PAGES_PER_SECOND.observe(len(wanted) / seconds if seconds > 0 else 0)
+        logger.info(
+            f"Extracted {characters} characters from {len(wanted)} of {page_count} pages with {engine} "
+            f"in {seconds:.2f}s ({len(wanted) - missing} pages cached)"
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Could not extract text from PDF: {str(e)}")
+    finally:
+        # The consumer may stop early; don't leave ranges running for nobody
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()
+
+async def extract_text_from_pdf(pdf_path: str, doc_id: Optional[str] = None,
+                                page_selection: Optional[PageSelection] = None) -> str:
+    """Extract text from PDF with better error handling.
+
+    Pages are joined with PAGE_BREAK; see iter_pdf_pages.
+    """
+    return PAGE_BREAK.join([page_text async for page_text in iter_pdf_pages(pdf_path, doc_id, page_selection)])
 
 def clean_text(text: str) -> str:
-    """Clean extracted text"""
-    # Remove excessive whitespace and newlines
-    text = re.sub(r'\n+', '\n', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+    """Clean extracted text.
+
+    The pages (split on PAGE_BREAK) are normalized together so running
+    headers, footers and page numbers can be recognized and dropped; see
+    normalize.py. Paragraphs stay separated by blank lines.
+    """
+    pages = [page for page in normalize_pages(text.split(PAGE_BREAK)) if page]
+    return PAGE_BREAK.join(pages)
+
+async def normalized_pages(pages: AsyncIterator[str]) -> AsyncIterator[str]:
+    """clean_text for streamed pages.
 
-def chunk_text(text: str, max_chars: int = 6000) -> List[str]:
-    """Split text into chunks for processing"""
-    if len(text) <= max_chars:
-        return [text]
+    The first NORMALIZE_WARMUP_PAGES pages are held back until enough pages
+    have been seen to tell running headers and footers from content.
+    """
+    normalizer = PageNormalizer()
+    held = []
+    async for page in pages:
+        normalizer.observe(page)
+        held.append(page)
+        if normalizer.pages_seen < NORMALIZE_WARMUP_PAGES:
+            continue
+        for held_page in held:
+            text = normalizer.normalize(held_page)
+            if text:
+                yield text
+        held = []
     
-    chunks = []
-    sentences = text.split('. ')
-    current_chunk = ""
+    for held_page in held:
+        text = normalizer.normalize(held_page)
+        if text:
+            yield text
+
+def validate_pdf_upload(file: UploadFile) -> None:
+    """Reject obviously wrong uploads before reading them"""
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
     
-    for sentence in sentences:
-        if len(current_chunk + sentence) <= max_chars:
-            current_chunk += sentence + ". "
-        else:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = sentence + ". "
+    if file.size and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=400, detail=f"File too large. Maximum size is {MAX_UPLOAD_MB}MB")
+
+async def save_upload(file: UploadFile) -> Tuple[str, str]:
+    """Stream an upload to a temp file while hashing it, returning (path, doc_id).
+
+    The PDF is never held in memory as a whole. The caller must remove the file.
+    """
+    try:
+        pdf_path, doc_id, size = await spool_upload(file, MAX_UPLOAD_BYTES, UPLOAD_TMP_DIR)
+    except UploadTooLarge:
+        raise HTTPException(status_code=400, detail=f"File too large. Maximum size is {MAX_UPLOAD_MB}MB")
+    
+    if size == 0:
+        remove_quietly(pdf_path)
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    
+    return pdf_path, doc_id
+
+def parse_page_selection(pages: Optional[str]) -> Optional[PageSelection]:
+    """Parse the `pages` parameter ("1-10,15,40-"), None when every page is wanted"""
+    if not pages or not pages.strip():
+        return None
+    try:
+        return pdf_extraction.parse_page_ranges(pages)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid pages parameter: {str(e)}")
+
+def upload_cost(size: Optional[int], page_selection: Optional[PageSelection] = None) -> float:
+    """Admission cost of an upload: its page count estimated from its size, bounded by the pages asked for"""
+    pages = max(1, math.ceil((size or MAX_UPLOAD_BYTES) / ADMISSION_BYTES_PER_PAGE))
+    if page_selection and all(last is not None for _, last in page_selection):
+        pages = min(pages, sum(last - first + 1 for first, last in page_selection))
+    return pages
+
+async def admit(cost: float, priority: str, shed: bool = True):
+    """Wait for admission and return the ticket to release, or answer 503 with Retry-After when shed"""
+    if admission is None:
+        return None
+    started = time.perf_counter()
+    try:
+        ticket = await admission.acquire(cost, priority, shed)
+    except Overloaded as e:
+        ADMISSION_SHED.labels(priority, e.reason).inc()
+        logger.warning(f"Shedding {priority} request of cost {cost} ({e.reason})")
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    ADMISSION_WAIT.labels(priority).observe(time.perf_counter() - started)
+    return ticket
+
+def release_admission(ticket) -> None:
+    if ticket is not None:
+        admission.release(ticket)
+
+@asynccontextmanager
+async def admitted(cost: float, priority: str, shed: bool = True):
+    ticket = await admit(cost, priority, shed)
+    try:
+        yield
+    finally:
+        release_admission(ticket)
+
+async def release_after(body: AsyncIterator[str], ticket) -> AsyncIterator[str]:
+    """Keep an admission ticket until a streamed response body has been sent"""
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        release_admission(ticket)
+
+async def load_document_from_path(pdf_path: str, doc_id: str, filename: str,
+                                  page_selection: Optional[PageSelection] = None) -> str:
+    """Cleaned text for a saved upload, extracting only on a cache miss.
+
+    A page selection bypasses the document cache (which holds whole
+    documents); its pages still come from the page cache when they can.
+    """
+    document = await document_store.get(doc_id) if not page_selection else None
+    if document is not None:
+        logger.info(f"Document cache hit for {filename} ({doc_id[:12]})")
+        return document["text"]
     
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+    with metrics.span("extraction"):
+        text = await extract_text_from_pdf(pdf_path, doc_id, page_selection)
+        text = clean_text(text)
     
-    return chunks
+    if not page_selection:
+        await document_store.put(doc_id, {"text": text, "filename": filename})
+    return text
 
-async def call_groq_api(prompt: str, max_tokens: int = 1500) -> str:
-    """Make API call to Groq (FREE but needs API key)"""
+async def load_document(file: UploadFile, page_selection: Optional[PageSelection] = None) -> Tuple[str, str]:
+    """Return (doc_id, cleaned text) for an upload, extracting only on a cache miss"""
+    pdf_path, doc_id = await save_upload(file)
     try:
+        text = await load_document_from_path(pdf_path, doc_id, file.filename, page_selection)
+    finally:
+        remove_quietly(pdf_path)
+    
+    return doc_id, text
+
+async def load_document_incrementally(file: UploadFile, page_selection: Optional[PageSelection] = None
+                                      ) -> Tuple[str, str, Optional[str], int]:
+    """Load an upload while its sections are already being summarized.
+
+    Returns (doc_id, cleaned text, final summary prompt, max_tokens); see
+    prepare_summary_prompt_incrementally. A cached document has nothing to
+    overlap with and goes through the regular map-reduce.
+
+    Streamed pages are normalized against the pages seen so far, which can
+    differ from normalizing them all at once. The returned and cached text
+    is therefore cleaned again as a whole, exactly like load_document does,
+    so a doc_id always maps to the same text.
+    """
+    pdf_path, doc_id = await save_upload(file)
+    try:
+        document = await document_store.get(doc_id) if not page_selection else None
+        if document is not None:
+            logger.info(f"Document cache hit for {file.filename} ({doc_id[:12]})")
+            text = document["text"]
+            prompt, max_tokens = await prepare_summary_prompt(text)
+            return doc_id, text, prompt, max_tokens
+        
+        raw_pages = []
+        
+        async def extracted_pages():
+            async for page_text in iter_pdf_pages(pdf_path, doc_id, page_selection):
+                raw_pages.append(page_text)
+                yield page_text
+        
+        prompt, max_tokens, _ = await prepare_summary_prompt_incrementally(normalized_pages(extracted_pages()))
+    finally:
+        remove_quietly(pdf_path)
+    
+    text = clean_text(PAGE_BREAK.join(raw_pages))
+    if not page_selection:
+        await document_store.put(doc_id, {"text": text, "filename": file.filename})
+    return doc_id, text, prompt, max_tokens
+
+async def compare_with_previous_version(doc_id: str, filename: str, text: str,
+                                       previous_doc_id: Optional[str] = None) -> Optional[dict]:
+    """Record this document's page hashes and diff them against previous_doc_id.
+
+    Only a version the caller names is compared with, since a doc_id grants
+    access to its document. Returns None when there is none to compare with.
+    """
+    if revision_store is None:
+        return None
+    
+    hashes = page_hashes(text.split(PAGE_BREAK))
+    previous_hashes = None
+    if previous_doc_id and previous_doc_id != doc_id:
+        previous_hashes = await revision_store.get_page_hashes(previous_doc_id)
+    await revision_store.put_document(doc_id, hashes)
+    if previous_hashes is None:
+        return None
+    
+    changed = count_changed_pages(previous_hashes, hashes)
+    logger.info(f"{filename}: {changed} of {len(hashes)} pages changed since {previous_doc_id[:12]}")
+    return {"previous_doc_id": previous_doc_id, "pages": len(hashes), "changed_pages": changed}
+
+async def get_cached_document(doc_id: str) -> str:
+    """Return cleaned text for a previously processed doc_id"""
+    if not is_valid_doc_id(doc_id):
+        raise HTTPException(status_code=400, detail="Invalid doc_id")
+
+    document = await document_store.get(doc_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found. Please upload the file again")
+
+    return document["text"]
+
+async def get_cached_pages(doc_id: str, page_selection: PageSelection) -> str:
+    """Cleaned text of selected pages of a previously processed document, from the page cache"""
+    if not is_valid_doc_id(doc_id):
+        raise HTTPException(status_code=400, detail="Invalid doc_id")
+    
+    page_count, pages = await page_cache.get_pages(doc_id, EXTRACTION_ENGINE) if page_cache is not None else (None, {})
+    wanted = pdf_extraction.select_pages(page_selection, page_count) if page_count else []
+    if not wanted or any(page not in pages for page in wanted):
+        raise HTTPException(status_code=404, detail="Document pages not found. Please upload the file again")
+    
+    return clean_text(PAGE_BREAK.join(pages[page] for page in wanted if pages[page]))
+
+def build_passage_index(text: str) -> PassageIndex:
+    """BM25 index over small passages of the document"""
+    return PassageIndex(chunk_text(text, max_tokens=PASSAGE_MAX_TOKENS))
+
+def get_passage_index(doc_id: str, text: str) -> PassageIndex:
+    """Passage index for a document, built once and kept with the cached document.
+
+    The index counts toward DOC_CACHE_MAX_MB and is evicted with its document.
+    """
+    document = document_store.peek(doc_id)
+    if document is not None and "passage_index" in document:
+        return document["passage_index"]
+    
+    index = build_passage_index(text)
+    document_store.attach(doc_id, "passage_index", index)
+    return index
+
+def record_llm_success(model: str, latency: float) -> None:
+    model_router.record_success(model, latency)
+    LLM_REQUESTS.labels(model, "success").inc()
+    LLM_LATENCY.labels(model).observe(latency)
+
+def record_llm_rate_limit(model: str, retry_after: Optional[float]) -> None:
+    model_router.record_rate_limit(model, retry_after)
+    LLM_REQUESTS.labels(model, "rate_limited").inc()
+    LLM_RATE_LIMITS.labels(model).inc()
+
+def record_llm_failure(model: str, reason: str) -> None:
+    model_router.record_failure(model, reason)
+    LLM_REQUESTS.labels(model, "error").inc()
+
+async def choose_model(tried: set, estimated_tokens: int) -> Optional[str]:
+    """Pick a model through the router and queue for its share of the rate limit.
+
+    Models with budget to spare right now are preferred over ones we would
+    have to wait for. Returns None when no model can be used in time.
+    """
+    busy = set()
+    if rate_limiter is not None:
+        busy = {model for model in GROQ_MODELS if rate_limiter.delay(model, estimated_tokens) > 0}
+    
+    model = await model_router.wait_for_model(ROUTER_MAX_WAIT, avoid=tried | busy)
+    if model is None:
+        logger.warning("Every model is rate limited or failing, giving up")
+        return None
+    
+    if rate_limiter is not None and not await rate_limiter.acquire(model, estimated_tokens, RATE_LIMIT_MAX_WAIT):
+        logger.warning(f"Rate limit queue for {model} is longer than {RATE_LIMIT_MAX_WAIT:.0f}s, giving up")
+        return None
+    
+    return model
+
+async def backoff_before_retry(attempt: int, tried: set) -> None:
+    """Sleep with jittered backoff, unless a model not yet tried for this call is available"""
+    if model_router.pick(avoid=tried) in tried:
+        await asyncio.sleep(jittered_backoff(attempt, ROUTER_BACKOFF_BASE, ROUTER_BACKOFF_MAX))
+
+async def call_groq_api(prompt: str, max_tokens: int = 1500, temperature: float = 0.3, top_p: float = 0.9) -> str:
+    """Make API call to Groq (FREE but needs API key).
+
+    Identical calls are answered from the response cache while fresh, and
+    identical calls already in flight are coalesced into one. The model
+    router picks which model to call, skipping rate-limited models and open
+    circuits, and retries with jittered backoff; the client-side rate limiter
+    queues the call until that model has request and token budget for it.
+    """
+    try:
+        cache_key = make_cache_key(GROQ_MODELS, prompt, max_tokens, temperature, top_p)
+        if response_cache is not None:
+            cached = await response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         if not GROQ_API_KEY:
             logger.error("No Groq API key provided!")
             return ""
         
-        headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
+        # Identical prompts already in flight share one upstream call
+        return await single_flight.do(
+            cache_key,
+            lambda: request_groq_completion(prompt, max_tokens, temperature, top_p, cache_key)
+        )
         
-        # Free Groq models (super fast!)
-        models = [
-            "llama3-70b-8192",     # Better quality for detailed summaries
-            "llama3-8b-8192",      # Fast and good
-            "mixtral-8x7b-32768",  # Good alternative
-            "gemma-7b-it"          # Another option
-        ]
+    except Exception as e:
+        logger.error(f"Error calling Groq API: {str(e)}")
+        return ""
+
+async def request_groq_completion(prompt: str, max_tokens: int, temperature: float, top_p: float,
+                                  cache_key: str) -> str:
+    """Send one chat completion through the model router and rate limiter"""
+    headers = {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    
+    client = get_http_client()
+    estimated_tokens = estimate_tokens(prompt) + max_tokens
+    
+    tried = set()
+    for attempt in range(ROUTER_MAX_ATTEMPTS):
+        model = await choose_model(tried, estimated_tokens)
+        if model is None:
+            break
+        tried.add(model)
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            for model in models:
-                try:
-                    payload = {
-                        "messages": [
-                            {
-                                "role": "user", 
-                                "content": prompt
-                            }
-                        ],
-                        "model": model,
-                        "max_tokens": max_tokens,
-                        "temperature": 0.3,
-                        "top_p": 0.9
+        try:
+            payload = {
+                "messages": [
+                    {
+                        "role": "user", 
+                        "content": prompt
                     }
-                    
-                    response = await client.post(
-                        "https://api.groq.com/openai/v1/chat/completions",
-                        headers=headers,
-                        json=payload
-                    )
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        content = result["choices"][0]["message"]["content"]
-                        return content.strip()
-                    elif response.status_code == 429:
-                        # Rate limit, try next model
-                        logger.warning(f"Rate limit hit for {model}, trying next...")
-                        continue
-                    else:
-                        logger.warning(f"API call failed for {model}: {response.status_code}")
-                        continue
-                        
-                except Exception as e:
-                    logger.warning(f"Error with model {model}: {str(e)}")
-                    continue
+                ],
+                "model": model,
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+                "top_p": top_p
+            }
+            
+            started = time.monotonic()
+            with metrics.span("llm", model=model):
+                response = await client.post(
+                    GROQ_API_URL,
+                    headers=headers,
+                    json=payload
+                )
+            
+            if response.status_code == 200:
+                record_llm_success(model, time.monotonic() - started)
+                result = response.json()
+                content = result["choices"][0]["message"]["content"].strip()
+                if response_cache is not None and content:
+                    await response_cache.set(cache_key, content)
+                return content
+            elif response.status_code == 429:
+                # Rate limit - the router skips this model until its window resets
+                record_llm_rate_limit(model, parse_retry_after(response.headers))
+                continue
+            else:
+                record_llm_failure(model, str(response.status_code))
+                if response.status_code >= 500:
+                    await backoff_before_retry(attempt, tried)
+                continue
+                
+        except Exception as e:
+            record_llm_failure(model, str(e))
+            await backoff_before_retry(attempt, tried)
+            continue
+    
+    return ""
+
+async def call_groq_api_stream(prompt: str, max_tokens: int = 1500, temperature: float = 0.3,
+                               top_p: float = 0.9) -> AsyncIterator[str]:
+    """Streaming counterpart of call_groq_api - yields content tokens as they arrive.
+
+    Routes through the model router like call_groq_api until one model starts
+    streaming. Yields nothing if no model is available. A cached response is
+    yielded as a single token; completed streams are added to the cache.
+    """
+    cache_key = make_cache_key(GROQ_MODELS, prompt, max_tokens, temperature, top_p)
+    if response_cache is not None:
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+    
+    if not GROQ_API_KEY:
+        logger.error("No Groq API key provided!")
+        return
+    
+    headers = {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    
+    client = get_http_client()
+    
+    estimated_tokens = estimate_tokens(prompt) + max_tokens
+    
+    tried = set()
+    for attempt in range(ROUTER_MAX_ATTEMPTS):
+        model = await choose_model(tried, estimated_tokens)
+        if model is None:
+            return
+        tried.add(model)
         
-        return ""
+        payload = {
+            "messages": [
+                {
+                    "role": "user", 
+                    "content": prompt
+                }
+            ],
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "stream": True
+        }
         
-    except Exception as e:
-        logger.error(f"Error calling Groq API: {str(e)}")
-        return ""
+        started_streaming = False
+        tokens = []
+        try:
+            started = time.monotonic()
+            async with client.stream("POST", GROQ_API_URL, headers=headers, json=payload) as response:
+                if response.status_code == 429:
+                    record_llm_rate_limit(model, parse_retry_after(response.headers))
+                    continue
+                elif response.status_code != 200:
+                    record_llm_failure(model, str(response.status_code))
+                    if response.status_code >= 500:
+                        await backoff_before_retry(attempt, tried)
+                    continue
+                
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    
+                    delta = json.loads(data)["choices"][0].get("delta", {})
+                    token = delta.get("content")
+                    if token:
+                        if not started_streaming:
+                            # Time to first token is what the router cares about for streams
+                            record_llm_success(model, time.monotonic() - started)
+                            started_streaming = True
+                        tokens.append(token)
+                        yield token
+                
+                content = "".join(tokens).strip()
+                if response_cache is not None and content:
+                    await response_cache.set(cache_key, content)
+                return
+                
+        except Exception as e:
+            if started_streaming:
+                # Part of the answer already reached the client, so don't restart on another model
+                logger.error(f"Stream from {model} broke off: {str(e)}")
+                return
+            record_llm_failure(model, str(e))
+            await backoff_before_retry(attempt, tried)
+            continue
 
 def generate_detailed_fallback_summary(text: str) -> str:
-    """Generate a more detailed fallback summary using text processing"""
+    """Generate a more detailed fallback summary using text processing.
+
+    The ten best TextRank sentences of the whole document, in document order.
+    """
     try:
-        sentences = text.split('.')
-        summary_sentences = []
-        
-        # Add first few sentences if meaningful
-        for i, sentence in enumerate(sentences[:3]):
-            sentence = sentence.strip()
-            if len(sentence) > 20:
-                summary_sentences.append(sentence)
-        
-        # Look for sentences with key terms
-        key_terms = ['important', 'significant', 'main', 'key', 'primary', 'conclusion', 
-                    'result', 'finding', 'analysis', 'research', 'study', 'data', 
-                    'evidence', 'shows', 'indicates', 'suggests', 'demonstrates']
-        
-        for sentence in sentences[3:15]:  # Look at more sentences
-            sentence = sentence.strip()
-            if len(sentence) > 30 and any(term in sentence.lower() for term in key_terms):
-                summary_sentences.append(sentence)
-                if len(summary_sentences) >= 8:  # Allow more sentences
-                    break
-        
-        # Add concluding sentences
-        for sentence in sentences[-3:]:
-            sentence = sentence.strip()
-            if len(sentence) > 30 and sentence not in summary_sentences:
-                summary_sentences.append(sentence)
-                if len(summary_sentences) >= 10:
-                    break
+        ranker = SentenceRanker(text)
+        summary_sentences = [ranker.sentences[i] for i in sorted(ranker.top(10))]
         
         if summary_sentences:
-            detailed_summary = '. '.join(summary_sentences) + '.'
-            return detailed_summary
+            return ' '.join(summary_sentences)
         else:
             return text[:800] + "..." if len(text) > 800 else text
             
@@ -210,15 +1022,230 @@ def generate_detailed_fallback_summary(text: str) -> str:
         logger.error(f"Error in detailed fallback summary: {str(e)}")
         return "Unable to generate summary due to processing error."
 
-async def generate_summary_with_groq(text: str) -> str:
-    """Generate detailed summary using Groq with chunking for large documents"""
+async def call_groq_api_with_retry(prompt: str, max_tokens: int, semaphore: asyncio.Semaphore) -> str:
+    """Call Groq under the shared semaphore, backing off when every model is rate limited"""
+    delay = SUMMARY_RETRY_DELAY
+    for attempt in range(SUMMARY_MAX_RETRIES + 1):
+        async with semaphore:
+            result = await call_groq_api(prompt, max_tokens=max_tokens)
+        if result or not GROQ_API_KEY or attempt == SUMMARY_MAX_RETRIES:
+            return result
+        # Sleep outside the semaphore so other sections keep the slots busy
+        await asyncio.sleep(delay)
+        delay *= 2
+    return ""
+
+async def summarize_section(i: int, chunk: str, semaphore: asyncio.Semaphore) -> str:
+    """Summary of one chunk (section i, 0-based), or "" when every retry failed"""
+    prompt = f"""Summarize this section of a larger document in detail. Focus on the main points, key information, and important details:
+
+Section {i+1}:
+{chunk}
+
+Detailed section summary:"""
+    
+    chunk_summary = await call_groq_api_with_retry(prompt, 600, semaphore)
+    logger.debug(f"Summarized chunk {i+1}")
+    return chunk_summary
+
+def label_section(i: int, chunk_summary: str) -> str:
+    return f"**Section {i+1}:**\n{chunk_summary}" if chunk_summary else ""
+
+# Per-request section counts ({"total", "reused"}), set by endpoints that report them
+section_counts: ContextVar[Optional[dict]] = ContextVar("section_counts", default=None)
+
+def count_section(key: str) -> None:
+    counts = section_counts.get()
+    if counts is not None:
+        counts[key] = counts.get(key, 0) + 1
+
+# Per-request override of SUMMARY_CHUNKING == "pages", set by /process for revisions
+page_chunking: ContextVar[Optional[bool]] = ContextVar("page_chunking", default=None)
+
+def chunks_by_page() -> bool:
+    requested = page_chunking.get()
+    return SUMMARY_CHUNKING == "pages" if requested is None else requested
+
+async def summarize_unique_section(i: int, chunk: str, sketch, semaphore: asyncio.Semaphore) -> str:
+    """summarize_section, unless a summary can be reused.
+
+    A chunk summarized before (typically in an earlier revision of the same
+    document) gets its stored summary back. A chunk the revision store
+    misses is new or edited text and always goes to the LLM: a similar
+    summary would hide the edit. Only without a revision store may a
+    near-duplicate of a section from an earlier document stand in.
+    """
+    chunk_hash = content_hash(chunk) if revision_store is not None else None
+    if chunk_hash is not None:
+        stored = await revision_store.get_summary(chunk_hash)
+        if stored:
+            SECTIONS_REUSED.labels("revision").inc()
+            count_section("reused")
+            return stored
+    
+    if chunk_hash is None and sketch is not None and section_sketches is not None:
+        stored = await section_sketches.lookup(sketch)
+        if stored:
+            SECTIONS_REUSED.labels("sketch_store").inc()
+            count_section("reused")
+            return stored
+    
+    chunk_summary = await summarize_section(i, chunk, semaphore)
+    if chunk_summary and chunk_hash is not None:
+        await revision_store.put_summary(chunk_hash, chunk_summary)
+    if chunk_summary and sketch is not None and section_sketches is not None:
+        await section_sketches.put(sketch, chunk_summary)
+    return chunk_summary
+
+def schedule_section_summary(i: int, chunk: str, tasks: List[asyncio.Task],
+                             duplicates: Optional[NearDuplicateIndex], semaphore: asyncio.Semaphore) -> None:
+    """Append the task producing section i's summary to `tasks`.
+
+    A near-duplicate of an earlier section of the same document shares that
+    section's task instead of making its own LLM call. Sections must be
+    scheduled in order.
+    """
+    count_section("total")
+    sketch = minhasher.sketch(chunk) if duplicates is not None else None
+    representative = duplicates.add(sketch) if duplicates is not None else i
+    if representative != i:
+        SECTIONS_REUSED.labels("duplicate").inc()
+        count_section("reused")
+        tasks.append(tasks[representative])
+    else:
+        tasks.append(asyncio.ensure_future(summarize_unique_section(i, chunk, sketch, semaphore)))
+
+def new_duplicate_index() -> Optional[NearDuplicateIndex]:
+    return NearDuplicateIndex(NEAR_DUPLICATE_THRESHOLD) if NEAR_DUPLICATE_ENABLED else None
+
+async def map_chunk_summaries(chunks: List[str], concurrency: int = None, on_section=None,
+                              semaphore: Optional[asyncio.Semaphore] = None) -> List[str]:
+    """Summarize every chunk with at most `concurrency` calls in flight.
+
+    Results come back in section order; sections that still fail after
+    retries are dropped, as in the sequential version. `on_section(index,
+    total, summary)` is called as each section finishes, in completion order.
+    Pass `semaphore` to share one concurrency budget across documents.
+    Near-duplicate sections are summarized once and keep their own numbers.
+    """
+    semaphore = semaphore or asyncio.Semaphore(concurrency or SUMMARY_CONCURRENCY)
+    duplicates = new_duplicate_index()
+    tasks: List[asyncio.Task] = []
+    for i, chunk in enumerate(chunks):
+        schedule_section_summary(i, chunk, tasks, duplicates, semaphore)
+    
+    unique = len(set(tasks))
+    if unique < len(chunks):
+        logger.info(f"Summarizing {unique} of {len(chunks)} sections; the rest are near-duplicates")
+    
+    async def summarize(i: int) -> str:
+        chunk_summary = await tasks[i]
+        if on_section and chunk_summary:
+            on_section(i, len(chunks), chunk_summary)
+        return label_section(i, chunk_summary)
+    
     try:
-        # Handle large documents by chunking
-        chunks = chunk_text(text, max_chars=6000)
+        summaries = await asyncio.gather(*(summarize(i) for i in range(len(chunks))))
+    finally:
+        for task in tasks:
+            task.cancel()
+    return [summary for summary in summaries if summary]
+
+SECTION_LABEL = re.compile(r'\*\*(Sections? [^:*]+):\*\*\n?')
+
+def without_section_label(summary: str) -> str:
+    """A section summary's text without its position label, which shifts when sections are added or removed"""
+    label = SECTION_LABEL.match(summary)
+    return summary[label.end():] if label else summary
+
+def group_summaries(summaries: List[str], max_chars: int, anchor_every: Optional[int] = None) -> List[List[str]]:
+    """Split consecutive summaries into groups whose joined length fits max_chars.
+
+    With anchor_every, a summary whose content hash is divisible by it also
+    ends its group, so a changed summary only regroups its neighbours up to
+    the next anchor and the other groups (and their cached merges) stay the same.
+    """
+    groups = []
+    current_group = []
+    current_length = 0
+    
+    for summary in summaries:
+        if current_group and current_length + len(summary) > max_chars:
+            groups.append(current_group)
+            current_group = []
+            current_length = 0
+        current_group.append(summary)
+        current_length += len(summary) + 2
+        if anchor_every and zlib.crc32(without_section_label(summary).encode("utf-8")) % anchor_every == 0:
+            groups.append(current_group)
+            current_group = []
+            current_length = 0
+    
+    if current_group:
+        groups.append(current_group)
+    
+    return groups
+
+async def reduce_chunk_summaries(summaries: List[str], max_chars: int = None, concurrency: int = None,
+                                 semaphore: Optional[asyncio.Semaphore] = None) -> str:
+    """Hierarchically merge section summaries until they fit the final prompt budget"""
+    max_chars = max_chars or SUMMARY_REDUCE_MAX_CHARS
+    semaphore = semaphore or asyncio.Semaphore(concurrency or SUMMARY_CONCURRENCY)
+    level = 1
+    
+    while len(summaries) > 1 and sum(len(summary) + 2 for summary in summaries) > max_chars:
+        groups = group_summaries(summaries, max_chars, SUMMARY_ANCHOR_EVERY if chunks_by_page() else None)
+        if len(groups) == len(summaries):
+            # Every summary is already too big to pair up - nothing left to merge
+            break
+        
+        logger.info(f"Reducing {len(summaries)} summaries into {len(groups)} groups (level {level})")
         
-        if len(chunks) == 1:
-            # Single chunk - generate detailed summary with better formatting
-            prompt = f"""Please provide a comprehensive and well-structured summary of the following document. 
+        async def merge_group(group: List[str]) -> str:
+            if len(group) == 1:
+                return group[0]
+            prompt = f"""Combine these consecutive section summaries from a larger document into one detailed summary. Keep the main points, key data and the order in which they appear:
+
+{chr(10).join(map(without_section_label, group))}
+
+Combined summary:"""
+            
+            merged = await call_groq_api_with_retry(prompt, 800, semaphore)
+            if not merged:
+                # Keep the originals rather than losing sections
+                return "\n\n".join(group)
+            first_label = SECTION_LABEL.match(group[0])
+            last_label = SECTION_LABEL.match(group[-1])
+            if first_label and last_label:
+                first = first_label.group(1).split()[-1].split('-')[0]
+                last = last_label.group(1).split()[-1].split('-')[-1]
+                return f"**Sections {first}-{last}:**\n{merged}"
+            return merged
+        
+        summaries = list(await asyncio.gather(*(merge_group(group) for group in groups)))
+        level += 1
+    
+    return "\n\n".join(summaries)
+
+def summary_chunk_tokens() -> int:
+    """Chunk size that fits every routable model's context with the summary prompt and output"""
+    return chunk_token_budget(GROQ_MODELS, max_output_tokens=800, cap=SUMMARY_CHUNK_MAX_TOKENS)
+
+def summary_chunks(text: str) -> List[str]:
+    """Split a document into the chunks that are summarized one by one (see SUMMARY_CHUNKING)"""
+    if chunks_by_page():
+        return chunk_pages(text.split(PAGE_BREAK), max_tokens=summary_chunk_tokens(), anchor_every=SUMMARY_ANCHOR_EVERY)
+    return chunk_text(text, max_tokens=summary_chunk_tokens(), overlap_tokens=SUMMARY_CHUNK_OVERLAP_TOKENS)
+
+def summary_chunk_accumulator():
+    """summary_chunks for pages that arrive one at a time"""
+    if chunks_by_page():
+        return PageChunkAccumulator(summary_chunk_tokens(), SUMMARY_ANCHOR_EVERY)
+    return ChunkAccumulator(summary_chunk_tokens(), SUMMARY_CHUNK_OVERLAP_TOKENS)
+
+def build_document_summary_prompt(text: str) -> str:
+    """Prompt for a document that fits in a single chunk"""
+    return f"""Please provide a comprehensive and well-structured summary of the following document. 
 
 FORMAT YOUR RESPONSE EXACTLY LIKE THIS:
 **Document Overview:**
@@ -244,33 +1271,10 @@ Make sure to use proper formatting with headers, bullet points, and clear paragr
 
 Document:
 {text}"""
-            
-            summary = await call_groq_api(prompt, max_tokens=800)
-            
-        else:
-            # Multiple chunks - summarize each and combine
-            chunk_summaries = []
-            
-            for i, chunk in enumerate(chunks):
-                logger.info(f"Summarizing chunk {i+1}/{len(chunks)}")
-                
-                prompt = f"""Summarize this section of a larger document in detail. Focus on the main points, key information, and important details:
-
-Section {i+1}:
-{chunk}
 
-Detailed section summary:"""
-                
-                chunk_summary = await call_groq_api(prompt, max_tokens=600)
-                if chunk_summary:
-                    chunk_summaries.append(f"**Section {i+1}:**\n{chunk_summary}")
-            
-            if chunk_summaries:
-                # Combine all chunk summaries
-                combined_text = "\n\n".join(chunk_summaries)
-                
-                # Generate final comprehensive summary with better formatting
-                final_prompt = f"""Based on these section summaries from a document, create a comprehensive and well-formatted overall summary:
+def build_final_summary_prompt(combined_text: str) -> str:
+    """Prompt that turns the reduced section summaries into the final summary"""
+    return f"""Based on these section summaries from a document, create a comprehensive and well-formatted overall summary:
 
 {combined_text}
 
@@ -295,50 +1299,158 @@ FORMAT YOUR RESPONSE EXACTLY LIKE THIS:
 [Overall conclusions and implications]
 
 Use proper formatting with headers and bullet points for clarity."""
-                
-                summary = await call_groq_api(final_prompt, max_tokens=1000)
-            else:
-                summary = ""
-        
-        if summary and len(summary.strip()) > 50:
-            return summary.strip()
-        else:
-            logger.warning("Groq summary too short or empty, using fallback")
-            return generate_formatted_fallback_summary(text)
+
+async def prepare_summary_prompt(text: str, on_section=None,
+                                 semaphore: Optional[asyncio.Semaphore] = None) -> Tuple[Optional[str], int]:
+    """Run the map-reduce stages and return the final summary prompt with its max_tokens.
+
+    Returns (None, 0) when no section could be summarized.
+    """
+    # Handle large documents by chunking
+    with metrics.span("chunking"):
+        chunks = summary_chunks(text)
+    SUMMARY_CHUNKS.observe(len(chunks))
+    
+    if len(chunks) == 1:
+        # Single chunk - generate detailed summary with better formatting
+        return build_document_summary_prompt(chunks[0]), 800
+    
+    # Multiple chunks - summarize sections concurrently, then reduce
+    with metrics.span("summary_map", chunks=len(chunks)):
+        chunk_summaries = await map_chunk_summaries(chunks, on_section=on_section, semaphore=semaphore)
+    
+    if not chunk_summaries:
+        return None, 0
+    
+    # Combine all chunk summaries, collapsing them first if they overflow the context
+    with metrics.span("summary_reduce"):
+        combined_text = await reduce_chunk_summaries(chunk_summaries, semaphore=semaphore)
+    return build_final_summary_prompt(combined_text), 1000
+
+async def prepare_summary_prompt_incrementally(pages: AsyncIterator[str],
+                                               semaphore: Optional[asyncio.Semaphore] = None
+                                               ) -> Tuple[Optional[str], int, str]:
+    """prepare_summary_prompt for a document that is still being extracted.
+
+    Pages are chunked as they arrive and each complete chunk is summarized
+    right away, so the LLM calls for early sections overlap the extraction of
+    later pages. The first chunk is held back until a second one exists, so a
+    single-chunk document still gets the one-call summary prompt. Returns
+    (prompt, max_tokens, full text); prompt is None when nothing could be
+    summarized.
+    """
+    semaphore = semaphore or asyncio.Semaphore(SUMMARY_CONCURRENCY)
+    accumulator = summary_chunk_accumulator()
+    duplicates = new_duplicate_index()
+    page_texts = []
+    chunks = []
+    tasks: List[asyncio.Task] = []
+    
+    def start_pending_sections():
+        for i in range(len(tasks), len(chunks)):
+            schedule_section_summary(i, chunks[i], tasks, duplicates, semaphore)
+    
+    try:
+        with metrics.span("summary_map"):
+            async for page_text in pages:
+                page_texts.append(page_text)
+                chunks.extend(accumulator.add(page_text))
+                if len(chunks) > 1:
+                    start_pending_sections()
+            chunks.extend(accumulator.finish())
+            text = PAGE_BREAK.join(page_texts)
+            SUMMARY_CHUNKS.observe(len(chunks))
+            
+            if len(chunks) <= 1:
+                return (build_document_summary_prompt(chunks[0]), 800, text) if chunks else (None, 0, text)
+            
+            start_pending_sections()
+            chunk_summaries = [
+                label_section(i, chunk_summary)
+                for i, chunk_summary in enumerate(await asyncio.gather(*tasks)) if chunk_summary
+            ]
+    finally:
+        for task in tasks:
+            task.cancel()
+    
+    if not chunk_summaries:
+        return None, 0, text
+    
+    with metrics.span("summary_reduce"):
+        combined_text = await reduce_chunk_summaries(chunk_summaries, semaphore=semaphore)
+    return build_final_summary_prompt(combined_text), 1000, text
+
+def finalize_summary(summary: str, text: str) -> str:
+    """Accept the model's summary or fall back to the formatted text-processing one"""
+    if summary and len(summary.strip()) > 50:
+        SUMMARIES.labels("llm").inc()
+        return summary.strip()
+    else:
+        logger.warning("Groq summary too short or empty, using fallback")
+        SUMMARIES.labels("fallback").inc()
+        return generate_formatted_fallback_summary(text)
+
+async def complete_summary(prompt: Optional[str], max_tokens: int, text: str,
+                           semaphore: Optional[asyncio.Semaphore] = None) -> str:
+    """Run the final summary call for a prepared prompt and finalize the result"""
+    if not prompt:
+        summary = ""
+    elif semaphore is not None:
+        async with semaphore:
+            with metrics.span("summary_final"):
+                summary = await call_groq_api(prompt, max_tokens=max_tokens)
+    else:
+        with metrics.span("summary_final"):
+            summary = await call_groq_api(prompt, max_tokens=max_tokens)
+    return finalize_summary(summary, text)
+
+async def generate_summary_with_groq(text: str, on_section=None,
+                                    semaphore: Optional[asyncio.Semaphore] = None) -> str:
+    """Generate detailed summary using Groq with chunking for large documents"""
+    try:
+        prompt, max_tokens = await prepare_summary_prompt(text, on_section=on_section, semaphore=semaphore)
+        return await complete_summary(prompt, max_tokens, text, semaphore)
         
     except Exception as e:
         logger.error(f"Error generating detailed summary: {str(e)}")
+        SUMMARIES.labels("fallback").inc()
         return generate_formatted_fallback_summary(text)
 
 def generate_formatted_fallback_summary(text: str) -> str:
-    """Generate a formatted fallback summary"""
+    """Generate a formatted fallback summary.
+
+    Sentences are picked by TextRank over the whole document (see
+    extractive.py): the overview from the opening tenth, key points and
+    figure-bearing details from anywhere, conclusions from the last part.
+    """
     try:
-        sentences = text.split('.')
+        ranker = SentenceRanker(text)
+        sentences = ranker.sentences
+        
+        overview = ranker.top(1, end=FALLBACK_OPENING_SHARE)
+        key_points = sorted(ranker.top(FALLBACK_KEY_POINTS, exclude=overview))
+        details = sorted(ranker.top(3, exclude=overview + key_points, predicate=contains_figures))
+        conclusions = ranker.top(2, start=1 - FALLBACK_CLOSING_SHARE, exclude=overview + key_points + details)
+        topics = ranker.top_terms(5)
         
-        # Extract key sentences
-        key_sentences = []
-        for sentence in sentences[:10]:  # First 10 sentences
-            sentence = sentence.strip()
-            if len(sentence) > 30:
-                key_sentences.append(sentence)
-                if len(key_sentences) >= 4:
-                    break
+        key_point_lines = [f"• {sentences[i]}" for i in key_points] or ["• Content analysis in progress"]
+        overview_text = f"This document contains {len(sentences)} sentences of content"
+        overview_text += f", mainly about {', '.join(topics)}." if topics else " covering various topics and information."
+        if overview:
+            overview_text += f" {sentences[overview[0]]}"
         
         # Format the fallback summary
         formatted_summary = f"""**Document Overview:**
-This document contains {len(sentences)} sentences of content covering various topics and information.
+{overview_text}
 
 **Key Points:**
-• {key_sentences[0] if len(key_sentences) > 0 else 'Content analysis in progress'}
-• {key_sentences[1] if len(key_sentences) > 1 else 'Additional information available'}
-• {key_sentences[2] if len(key_sentences) > 2 else 'Further details provided'}
-• {key_sentences[3] if len(key_sentences) > 3 else 'More content to review'}
+{chr(10).join(key_point_lines)}
 
 **Important Details:**
-The document provides detailed information and context about the subject matter, with specific examples and supporting evidence throughout the text.
+{' '.join(sentences[i] for i in details) if details else 'The document provides detailed information and context about the subject matter, with specific examples and supporting evidence throughout the text.'}
 
 **Conclusions & Implications:**
-This document serves as a comprehensive resource providing valuable insights and information for readers seeking to understand the covered topics."""
+{' '.join(sentences[i] for i in sorted(conclusions)) if conclusions else 'This document serves as a comprehensive resource providing valuable insights and information for readers seeking to understand the covered topics.'}"""
         
         return formatted_summary
         
@@ -346,6 +1458,9 @@ This document serves as a comprehensive resource providing valuable insights and
         logger.error(f"Error in formatted fallback summary: {str(e)}")
         return "**Summary Error:** Unable to generate summary due to processing error."
 
+def contains_figures(sentence: str) -> bool:
+    return bool(re.search(r'\d', sentence))
+
 async def generate_questions_with_groq(text: str) -> List[str]:
     """Generate questions using Groq"""
     try:
@@ -360,7 +1475,8 @@ async def generate_questions_with_groq(text: str) -> List[str]:
 Questions:
 1."""
         
-        questions_text = await call_groq_api(prompt, max_tokens=400)
+        with metrics.span("questions"):
+            questions_text = await call_groq_api(prompt, max_tokens=400)
         
         questions = []
         if questions_text:
@@ -407,14 +1523,20 @@ def generate_fallback_questions(text: str) -> List[str]:
     
     return questions
 
-async def answer_question_with_groq(text: str, question: str) -> str:
-    """Answer question using Groq with better formatting"""
-    try:
-        max_chars = 2500
+def build_answer_prompt(text: str, question: str, index: Optional[PassageIndex] = None) -> str:
+    """Prompt for answering a question from the passages most relevant to it"""
+    index = index or build_passage_index(text)
+    passages = index.select(question, max_tokens=ANSWER_CONTEXT_TOKENS, k=ANSWER_TOP_K)
+    
+    if passages:
+        text = "\n\n...\n\n".join(passages)
+    else:
+        # Nothing matched the question - fall back to the start of the document
+        max_chars = ANSWER_CONTEXT_TOKENS * 4
         if len(text) > max_chars:
             text = text[:max_chars] + "..."
-        
-        prompt = f"""Please provide a well-structured and comprehensive answer to the following question based on the provided document. 
+    
+    return f"""Please provide a well-structured and comprehensive answer to the following question based on the provided document. 
 
 FORMAT YOUR RESPONSE EXACTLY LIKE THIS:
 **Direct Answer:**
@@ -438,20 +1560,114 @@ Question: {question}
 Document: {text}
 
 Formatted Answer:"""
-        
-        answer = await call_groq_api(prompt, max_tokens=400)
-        
-        if answer and len(answer.strip()) > 10:
-            return answer.strip()
-        else:
-            return generate_formatted_simple_answer(text, question)
+
+def finalize_answer(answer: str, text: str, question: str, index: Optional[PassageIndex] = None) -> str:
+    """Accept the model's answer or fall back to keyword search"""
+    if answer and len(answer.strip()) > 10:
+        ANSWERS.labels("llm").inc()
+        return answer.strip()
+    else:
+        ANSWERS.labels("fallback").inc()
+        return generate_formatted_simple_answer(text, question, index)
+
+async def answer_question_with_groq(text: str, question: str, index: Optional[PassageIndex] = None) -> str:
+    """Answer question using Groq with better formatting"""
+    try:
+        index = index or build_passage_index(text)
+        with metrics.span("answer"):
+            answer = await call_groq_api(build_answer_prompt(text, question, index), max_tokens=400)
+        return finalize_answer(answer, text, question, index)
         
     except Exception as e:
         logger.error(f"Error answering question: {str(e)}")
-        return generate_formatted_simple_answer(text, question)
+        ANSWERS.labels("fallback").inc()
+        return generate_formatted_simple_answer(text, question, index)
+
+def build_combined_answer_prompt(questions: List[str], passages: List[str]) -> str:
+    """Prompt for answering several questions from one shared set of passages"""
+    numbered = "\n".join(f"{i+1}. {question}" for i, question in enumerate(questions))
+    context = "\n\n...\n\n".join(passages)
+    return f"""Answer each of the following questions based on the provided document. Answer every question separately, in order.
+
+FORMAT EACH ANSWER EXACTLY LIKE THIS:
+### Question [number]
+**Direct Answer:**
+[Clear, direct answer to the question]
+
+**Key Details:**
+• [First important detail or supporting point]
+• [Second important detail or supporting point]
+
+**Supporting Evidence:**
+[Specific examples, data, or quotes from the document that support the answer]
+
+Be specific and use information directly from the document.
+
+Questions:
+{numbered}
+
+Document: {context}
+
+Formatted Answers:"""
+
+def split_combined_answers(response: str, count: int) -> List[Optional[str]]:
+    """Split a combined answer into one answer per question (None where one is missing)"""
+    answers: List[Optional[str]] = [None] * count
+    parts = re.split(r'^\s*#{2,4}\s*Question\s+(\d+)[^\n]*$', response or "", flags=re.MULTILINE)
+    for number, body in zip(parts[1::2], parts[2::2]):
+        position = int(number) - 1
+        if 0 <= position < count and body.strip():
+            answers[position] = body.strip()
+    return answers
+
+async def answer_questions_with_groq(text: str, questions: List[str],
+                                     index: Optional[PassageIndex] = None) -> dict:
+    """Answer several questions about one document, keyed by question.
 
-def generate_formatted_simple_answer(text: str, question: str) -> str:
-    """Generate formatted simple answer using text search"""
+    When the union of their best passages fits ANSWER_BATCH_CONTEXT_TOKENS
+    they share a single LLM call; questions the combined answer misses, or
+    that don't fit, are answered concurrently one call each.
+    """
+    index = index or build_passage_index(text)
+    questions = list(dict.fromkeys(questions))
+    answers = {}
+    remaining = questions
+    
+    if 1 < len(questions) <= ANSWER_BATCH_MAX_QUESTIONS:
+        passage_ids = set()
+        for question in questions:
+            passage_ids.update(index.select_ids(question, max_tokens=ANSWER_CONTEXT_TOKENS, k=ANSWER_TOP_K))
+        passages = [index.passages[i] for i in sorted(passage_ids)]
+        
+        if passages and sum(estimate_tokens(passage) for passage in passages) <= ANSWER_BATCH_CONTEXT_TOKENS:
+            try:
+                response = await call_groq_api(
+                    build_combined_answer_prompt(questions, passages),
+                    max_tokens=ANSWER_BATCH_TOKENS_PER_QUESTION * len(questions)
+                )
+                for question, answer in zip(questions, split_combined_answers(response, len(questions))):
+                    if answer and len(answer) > 10:
+                        ANSWERS.labels("llm").inc()
+                        answers[question] = answer
+            except Exception as e:
+                logger.error(f"Error answering questions together: {str(e)}")
+            remaining = [question for question in questions if question not in answers]
+            logger.info(f"Answered {len(answers)}/{len(questions)} questions in one call")
+    
+    if remaining:
+        semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+        
+        async def answer_one(question: str) -> str:
+            async with semaphore:
+                return await answer_question_with_groq(text, question, index)
+        
+        for question, answer in zip(remaining, await asyncio.gather(*(answer_one(q) for q in remaining))):
+            answers[question] = answer
+    
+    return {question: answers[question] for question in questions}
+
+def generate_formatted_simple_answer(text: str, question: str, index: Optional[PassageIndex] = None) -> str:
+    """Generate formatted simple answer using text search over the best matching passages"""
     try:
         question_lower = question.lower()
         question_words = re.findall(r'\b\w+\b', question_lower)
@@ -464,14 +1680,22 @@ I need more specific terms in the question to find relevant information.
 **Suggestion:**
 Please try rephrasing your question with more specific keywords related to the document content."""
         
-        sentences = text.split('.')
+        if index is not None:
+            # Only scan the passages BM25 ranks highest, best first
+            candidates = [index.passages[i] for i, _ in index.search(question, k=ANSWER_TOP_K)]
+        else:
+            candidates = [text]
+        
         relevant_sentences = []
         
-        for sentence in sentences:
-            if any(word in sentence.lower() for word in question_words):
-                relevant_sentences.append(sentence.strip())
-                if len(relevant_sentences) >= 3:
-                    break
+        for passage in candidates:
+            for sentence in passage.split('.'):
+                if any(word in sentence.lower() for word in question_words):
+                    relevant_sentences.append(sentence.strip())
+                    if len(relevant_sentences) >= 3:
+                        break
+            if len(relevant_sentences) >= 3:
+                break
         
         if relevant_sentences:
             formatted_answer = f"""**Direct Answer:**
@@ -501,6 +1725,54 @@ I encountered an error while trying to answer that question.
 **Suggestion:**
 Please try rephrasing your question or contact support if the issue persists."""
 
+def elapsed_ms(started: float) -> float:
+    """Milliseconds since a time.perf_counter() reading"""
+    return round((time.perf_counter() - started) * 1000, 1)
+
+async def timed(coro):
+    """Await a coroutine and return (result, elapsed milliseconds)"""
+    started = time.perf_counter()
+    result = await coro
+    return result, elapsed_ms(started)
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """Track in-flight requests and latency per route, plus timing spans when DEBUG_TIMINGS is on"""
+    started = time.perf_counter()
+    spans = metrics.start_spans() if DEBUG_TIMINGS else None
+    HTTP_IN_FLIGHT.inc()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        HTTP_IN_FLIGHT.dec()
+        raise
+    
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    HTTP_DURATION.labels(request.method, path, response.status_code).observe(time.perf_counter() - started)
+    if spans:
+        response.headers["Server-Timing"] = metrics.format_server_timing(spans)
+    
+    # Streaming responses are still in flight until their body is sent
+    body_iterator = response.body_iterator
+    
+    async def track_body():
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            HTTP_IN_FLIGHT.dec()
+    
+    response.body_iterator = track_body()
+    return response
+
+def with_spans(payload: dict) -> dict:
+    """Attach this request's timing spans to a JSON response when DEBUG_TIMINGS is on"""
+    spans = metrics.current_spans()
+    if spans is not None:
+        payload["spans"] = sorted(spans, key=lambda record: record["start_ms"])
+    return payload
+
 @app.get("/")
 async def root():
     return {
@@ -511,96 +1783,649 @@ async def root():
         "features": "Enhanced detailed summaries with better formatting"
     }
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text-format metrics"""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
     return {
         "status": "healthy", 
         "api_type": "groq_free",
         "message": "PDF processor with Groq AI ready - Enhanced version with formatting",
-        "has_api_key": bool(GROQ_API_KEY)
+        "has_api_key": bool(GROQ_API_KEY),
+        "llm_cache": response_cache.stats() if response_cache is not None else None,
+        "extraction_engine": EXTRACTION_ENGINE,
+        "page_cache": page_cache.stats() if page_cache is not None else None,
+        "section_sketches": section_sketches.stats() if section_sketches is not None else None,
+        "revisions": revision_store.stats() if revision_store is not None else None,
+        "models": model_router.stats(),
+        "rate_limiter": rate_limiter.stats() if rate_limiter is not None else None,
+        "admission": admission.stats() if admission is not None else None,
+        "coalesced_calls": single_flight.coalesced
     }
 
 @app.post("/process")
-async def process_pdf(file: UploadFile = File(...)):
-    """Process PDF and return detailed summary with questions"""
+async def process_pdf(
+    file: UploadFile = File(...),
+    include_summary: bool = True,
+    include_questions: bool = True,
+    pages: Optional[str] = None,
+    incremental: bool = False,
+    previous_doc_id: Optional[str] = None,
+    track_revisions: bool = False
+):
+    """Process PDF and return detailed summary with questions.
+
+    Summary and question generation run concurrently; either can be skipped
+    with the include_summary / include_questions query parameters. `pages`
+    ("1-10,15,40-", 1-based) limits processing to those pages. With
+    `incremental=true` sections are summarized while later pages are still
+    being extracted; extraction_ms then includes the section summaries.
+
+    A revised upload can name its previous version with previous_doc_id to
+    get the number of changed pages back. Its summary chunks are then
+    aligned to pages, so chunks whose pages did not change reuse their
+    earlier summaries; `sections.reused` counts them. That only works if the
+    previous version was chunked the same way: upload a first version with
+    track_revisions=true (or set SUMMARY_CHUNKING=pages).
+    """
+    try:
+        started = time.perf_counter()
+        timings = {}
+        
+        validate_pdf_upload(file)
+        page_selection = parse_page_selection(pages)
+        if previous_doc_id and not is_valid_doc_id(previous_doc_id):
+            raise HTTPException(status_code=400, detail="Invalid previous_doc_id")
+        sections = {"total": 0, "reused": 0}
+        section_counts.set(sections)
+        if previous_doc_id or track_revisions:
+            page_chunking.set(True)
+        
+        async with admitted(upload_cost(file.size, page_selection), "bulk"):
+            logger.info(f"Processing PDF: {file.filename}" + (f" (pages {pages})" if page_selection else ""))
+            
+            if incremental and include_summary:
+                doc_id, text, summary_prompt, summary_max_tokens = await load_document_incrementally(file, page_selection)
+            else:
+                doc_id, text = await load_document(file, page_selection)
+            timings["extraction_ms"] = elapsed_ms(started)
+            
+            if len(text.strip()) < 50:
+                raise HTTPException(status_code=400, detail="PDF appears to be empty or contains very little text")
+            
+            revision = None
+            if not page_selection:
+                revision = await compare_with_previous_version(doc_id, file.filename, text, previous_doc_id)
+            
+            stages = {}
+            if include_summary:
+                logger.info("Generating detailed summary with Groq...")
+                if incremental:
+                    stages["summary"] = timed(complete_summary(summary_prompt, summary_max_tokens, text))
+                else:
+                    stages["summary"] = timed(generate_summary_with_groq(text))
+            if include_questions:
+                logger.info("Generating questions with Groq...")
+                stages["questions"] = timed(generate_questions_with_groq(text))
+            
+            results = dict(zip(stages, await asyncio.gather(*stages.values())))
+            
+            summary, timings["summary_ms"] = results.get("summary", (None, None))
+            questions, timings["questions_ms"] = results.get("questions", (None, None))
+            timings["total_ms"] = elapsed_ms(started)
+            
+            logger.info(f"Processing completed successfully in {timings['total_ms']}ms")
+            
+            return with_spans({
+                "summary": summary,
+                "questions": questions,
+                "text_length": len(text),
+                "summary_length": len(summary) if summary else 0,
+                "status": "success",
+                "api_type": "groq_free_enhanced_formatted",
+                "filename": file.filename,
+                "doc_id": doc_id,
+                "pages": pages if page_selection else None,
+                "revision": revision,
+                "sections": sections,
+                "timings": timings
+            })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error processing PDF: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
+
+@app.post("/ask")
+async def ask_question(
+    question: Optional[str] = Form(None),
+    questions: List[str] = Form([]),
+    file: Optional[UploadFile] = File(None),
+    doc_id: Optional[str] = Form(None),
+    pages: Optional[str] = Form(None)
+):
+    """Answer a question about the PDF content using Groq.
+
+    Pass the doc_id returned by /process to skip the upload and extraction;
+    the file is only needed when the document is not cached. Send the
+    `questions` field (repeated) to ask several at once; the response then
+    has an `answers` object keyed by question instead of `answer`. `pages`
+    ("1-10,15,40-", 1-based) answers from those pages only.
+    """
+    try:
+        asked = [q.strip() for q in ([question] if question else []) + (questions or []) if q and q.strip()]
+        if not asked:
+            raise HTTPException(status_code=400, detail="Question cannot be empty")
+        if len(asked) > ASK_MAX_QUESTIONS:
+            raise HTTPException(status_code=400, detail=f"Too many questions. Maximum is {ASK_MAX_QUESTIONS}")
+        
+        logger.info(f"Answering {len(asked)} question(s) with Groq: {asked}")
+        
+        page_selection = parse_page_selection(pages)
+        
+        # A cached document only costs passage retrieval and the answer calls
+        cached = bool(doc_id) and not page_selection and await document_store.contains(doc_id)
+        uploading = file is not None and not cached
+        async with admitted(upload_cost(file.size, page_selection) if uploading else 1, "interactive"):
+            if doc_id and page_selection and file is None:
+                text = await get_cached_pages(doc_id, page_selection)
+            elif doc_id and not page_selection and (file is None or cached):
+                text = await get_cached_document(doc_id)
+            elif file is not None:
+                doc_id, text = await load_document(file, page_selection)
+            else:
+                raise HTTPException(status_code=400, detail="Either a file or a doc_id is required")
+            
+            # The index kept with a cached document covers all of its pages
+            index = build_passage_index(text) if page_selection else get_passage_index(doc_id, text)
+            
+            if questions:
+                answers = await answer_questions_with_groq(text, asked, index)
+                logger.info(f"Answered {len(answers)} questions successfully")
+                return with_spans({
+                    "answers": answers,
+                    "status": "success",
+                    "api_type": "groq_free_enhanced_formatted",
+                    "doc_id": doc_id,
+                    "pages": pages if page_selection else None
+                })
+            
+            answer = await answer_question_with_groq(text, asked[0], index)
+            
+            logger.info("Question answered successfully")
+            
+            return with_spans({
+                "answer": answer,
+                "status": "success",
+                "api_type": "groq_free_enhanced_formatted",
+                "doc_id": doc_id,
+                "pages": pages if page_selection else None
+            })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error answering question: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error answering question: {str(e)}")
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_summary(text: str, emit) -> str:
+    """Emit section summaries and final summary tokens, returning the final summary"""
+    def on_section(index: int, total: int, section_summary: str):
+        emit("section", {"index": index + 1, "total": total, "summary": section_summary})
+    
     try:
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        prompt, max_tokens = await prepare_summary_prompt(text, on_section=on_section)
+        tokens = []
+        if prompt:
+            async for token in call_groq_api_stream(prompt, max_tokens=max_tokens):
+                tokens.append(token)
+                emit("summary_token", {"token": token})
+        return finalize_summary("".join(tokens), text)
+    except Exception as e:
+        logger.error(f"Error streaming summary: {str(e)}")
+        return generate_formatted_fallback_summary(text)
+
+async def stream_events(stages: dict) -> AsyncIterator[str]:
+    """Run stage coroutines concurrently and yield their events as SSE messages.
+
+    Each stage is called with an emit(event, data) function and its return
+    value is sent as an event named after the stage. A final "done" event
+    carries per-stage timings.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    started = time.perf_counter()
+    timings = {}
+    
+    def emit(event: str, data):
+        queue.put_nowait((event, data))
+    
+    async def run_stage(name: str, stage):
+        try:
+            result = await stage(emit)
+            timings[f"{name}_ms"] = elapsed_ms(started)
+            emit(name, {name: result})
+        except Exception as e:
+            logger.error(f"Stage {name} failed: {str(e)}")
+            emit("error", {"stage": name, "detail": str(e)})
+    
+    tasks = [asyncio.create_task(run_stage(name, stage)) for name, stage in stages.items()]
+    all_done = asyncio.gather(*tasks)
+    all_done.add_done_callback(lambda _: queue.put_nowait(None))
+    
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            yield sse_event(*item)
         
-        if file.size and file.size > 25 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="File too large. Maximum size is 25MB")
+        timings["total_ms"] = elapsed_ms(started)
+        yield sse_event("done", {"timings": timings})
+    finally:
+        # Client went away - stop spending LLM calls on it
+        for task in tasks:
+            task.cancel()
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.post("/process/stream")
+async def process_pdf_stream(
+    file: UploadFile = File(...),
+    include_summary: bool = True,
+    include_questions: bool = True
+):
+    """Streaming /process - Server-Sent Events as each stage finishes.
+
+    Events: extracted, section (per chunk summary), summary_token, summary,
+    questions, error, done.
+    """
+    validate_pdf_upload(file)
+    
+    logger.info(f"Streaming PDF processing: {file.filename}")
+    
+    # Admitted until the last event is sent
+    ticket = await admit(upload_cost(file.size), "bulk")
+    try:
+        started = time.perf_counter()
+        doc_id, text = await load_document(file)
+        extraction_ms = elapsed_ms(started)
         
-        logger.info(f"Processing PDF: {file.filename}")
+        if len(text.strip()) < 50:
+            raise HTTPException(status_code=400, detail="PDF appears to be empty or contains very little text")
+    except BaseException:
+        release_admission(ticket)
+        raise
+    
+    stages = {}
+    if include_summary:
+        stages["summary"] = lambda emit: stream_summary(text, emit)
+    if include_questions:
+        stages["questions"] = lambda emit: generate_questions_with_groq(text)
+    
+    async def events():
+        yield sse_event("extracted", {
+            "doc_id": doc_id,
+            "filename": file.filename,
+            "text_length": len(text),
+            "extraction_ms": extraction_ms
+        })
+        async for event in stream_events(stages):
+            yield event
+    
+    return StreamingResponse(release_after(events(), ticket), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/ask/stream")
+async def ask_question_stream(
+    question: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    doc_id: Optional[str] = Form(None)
+):
+    """Streaming /ask - Server-Sent Events with answer tokens as they arrive.
+
+    Events: document, answer_token, answer, error, done.
+    """
+    if not question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    
+    logger.info(f"Streaming answer with Groq: {question}")
+    
+    cached = bool(doc_id) and await document_store.contains(doc_id)
+    uploading = file is not None and not cached
+    ticket = await admit(upload_cost(file.size) if uploading else 1, "interactive")
+    try:
+        if doc_id and (file is None or cached):
+            text = await get_cached_document(doc_id)
+        elif file is not None:
+            doc_id, text = await load_document(file)
+        else:
+            raise HTTPException(status_code=400, detail="Either a file or a doc_id is required")
         
-        text = extract_text_from_pdf(file.file)
+        index = get_passage_index(doc_id, text)
+    except BaseException:
+        release_admission(ticket)
+        raise
+    
+    async def stream_answer(emit) -> str:
+        tokens = []
+        async for token in call_groq_api_stream(build_answer_prompt(text, question, index), max_tokens=400):
+            tokens.append(token)
+            emit("answer_token", {"token": token})
+        return finalize_answer("".join(tokens), text, question, index)
+    
+    async def events():
+        yield sse_event("document", {"doc_id": doc_id})
+        async for event in stream_events({"answer": stream_answer}):
+            yield event
+    
+    return StreamingResponse(release_after(events(), ticket), media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def spool_batch_uploads(files: List[UploadFile]) -> List[dict]:
+    """Save every PDF in a batch (including PDFs inside zip files) to temp files.
+
+    Returns one entry per PDF with filename, path and doc_id, or an error
+    for uploads that were rejected. Together the saved PDFs stay within
+    BATCH_MAX_TOTAL_BYTES. The caller must remove the paths.
+    """
+    entries = []
+    total = 0
+    too_large = f"Batch exceeds the {BATCH_MAX_TOTAL_MB}MB total size limit"
+    try:
+        for file in files:
+            if file.filename.lower().endswith('.zip'):
+                try:
+                    zip_path, _, _ = await spool_upload(file, MAX_UPLOAD_BYTES, UPLOAD_TMP_DIR)
+                except UploadTooLarge:
+                    entries.append({"filename": file.filename, "error": f"File too large. Maximum size is {MAX_UPLOAD_MB}MB"})
+                    continue
+                try:
+                    members = await asyncio.to_thread(
+                        spool_zip_members, zip_path, MAX_UPLOAD_BYTES, BATCH_MAX_FILES,
+                        BATCH_MAX_TOTAL_BYTES - total, BATCH_MAX_COMPRESSION_RATIO, UPLOAD_TMP_DIR
+                    )
+                except ValueError as e:
+                    entries.append({"filename": file.filename, "error": str(e)})
+                    continue
+                finally:
+                    remove_quietly(zip_path)
+                for name, path, doc_id, size in members:
+                    total += size
+                    if size == 0:
+                        remove_quietly(path)
+                        entries.append({"filename": name, "error": "Uploaded file is empty"})
+                    else:
+                        entries.append({"filename": name, "path": path, "doc_id": doc_id})
+            else:
+                if file.size and total + file.size > BATCH_MAX_TOTAL_BYTES:
+                    entries.append({"filename": file.filename, "error": too_large})
+                    continue
+                try:
+                    validate_pdf_upload(file)
+                    path, doc_id = await save_upload(file)
+                except HTTPException as e:
+                    entries.append({"filename": file.filename, "error": e.detail})
+                    continue
+                size = os.path.getsize(path)
+                if total + size > BATCH_MAX_TOTAL_BYTES:
+                    remove_quietly(path)
+                    entries.append({"filename": file.filename, "error": too_large})
+                    continue
+                total += size
+                entries.append({"filename": file.filename, "path": path, "doc_id": doc_id})
+            
+            if len(entries) > BATCH_MAX_FILES:
+                raise HTTPException(status_code=400, detail=f"Too many files. Maximum is {BATCH_MAX_FILES} per batch")
+    except BaseException:
+        for entry in entries:
+            if entry.get("path"):
+                remove_quietly(entry["path"])
+        raise
+    
+    return entries
+
+async def process_batch_document(path: str, doc_id: str, filename: str, include_summary: bool,
+                                 include_questions: bool, semaphore: asyncio.Semaphore) -> dict:
+    """Extract and summarize one unique document of a batch, never raising"""
+    started = time.perf_counter()
+    timings = {}
+    try:
+        text = await load_document_from_path(path, doc_id, filename)
+        timings["extraction_ms"] = elapsed_ms(started)
         
         if len(text.strip()) < 50:
             raise HTTPException(status_code=400, detail="PDF appears to be empty or contains very little text")
         
-        text = clean_text(text)
+        async def questions_stage() -> List[str]:
+            async with semaphore:
+                return await generate_questions_with_groq(text)
         
-        logger.info("Generating detailed summary with Groq...")
-        summary = await generate_summary_with_groq(text)
+        stages = {}
+        if include_summary:
+            stages["summary"] = timed(generate_summary_with_groq(text, semaphore=semaphore))
+        if include_questions:
+            stages["questions"] = timed(questions_stage())
         
-        logger.info("Generating questions with Groq...")
-        questions = await generate_questions_with_groq(text)
+        results = dict(zip(stages, await asyncio.gather(*stages.values())))
         
-        logger.info("Processing completed successfully")
+        summary, timings["summary_ms"] = results.get("summary", (None, None))
+        questions, timings["questions_ms"] = results.get("questions", (None, None))
+        timings["total_ms"] = elapsed_ms(started)
         
         return {
             "summary": summary,
             "questions": questions,
             "text_length": len(text),
-            "summary_length": len(summary),
+            "summary_length": len(summary) if summary else 0,
             "status": "success",
-            "api_type": "groq_free_enhanced_formatted",
-            "filename": file.filename
+            "timings": timings
         }
-        
-    except HTTPException:
-        raise
+    
+    except HTTPException as e:
+        return {"status": "error", "detail": e.detail}
     except Exception as e:
-        logger.error(f"Unexpected error processing PDF: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
+        logger.error(f"Unexpected error processing {filename} in batch: {str(e)}")
+        return {"status": "error", "detail": f"Processing error: {str(e)}"}
+    finally:
+        remove_quietly(path)
 
-@app.post("/ask")
-async def ask_question(file: UploadFile = File(...), question: str = Form(...)):
-    """Answer a question about the PDF content using Groq"""
+async def batch_results(entries: List[dict], include_summary: bool, include_questions: bool) -> AsyncIterator[str]:
+    """NDJSON lines, one per uploaded file as its document finishes, then a final "done" line"""
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+    document_slots = asyncio.Semaphore(BATCH_DOCUMENT_CONCURRENCY)
+    by_doc = {}
+    
+    for entry in entries:
+        if "error" in entry:
+            continue
+        if entry["doc_id"] in by_doc:
+            remove_quietly(entry["path"])
+        by_doc.setdefault(entry["doc_id"], []).append(entry)
+    
+    async def run(doc_id: str) -> Tuple[str, dict]:
+        # Each document is admitted like a /process request of its own (sized from
+        # the unzipped file); the batch has already been accepted, so it waits
+        first = by_doc[doc_id][0]
+        async with document_slots:
+            async with admitted(upload_cost(os.path.getsize(first["path"])), "bulk", shed=False):
+                result = await process_batch_document(
+                    first["path"], doc_id, first["filename"], include_summary, include_questions, semaphore
+                )
+        return doc_id, result
+    
+    tasks = [asyncio.ensure_future(run(doc_id)) for doc_id in by_doc]
+    logger.info(f"Batch of {len(entries)} files: {len(by_doc)} unique documents")
+    
     try:
-        if not question.strip():
-            raise HTTPException(status_code=400, detail="Question cannot be empty")
+        for entry in entries:
+            if "error" in entry:
+                yield json.dumps({"filename": entry["filename"], "status": "error", "detail": entry["error"]}) + "\n"
         
-        logger.info(f"Answering question with Groq: {question}")
+        for next_done in asyncio.as_completed(tasks):
+            doc_id, result = await next_done
+            first_filename = by_doc[doc_id][0]["filename"]
+            for entry in by_doc[doc_id]:
+                line = {"filename": entry["filename"], "doc_id": doc_id, **result}
+                if entry is not by_doc[doc_id][0]:
+                    line["duplicate_of"] = first_filename
+                yield json.dumps(line) + "\n"
         
-        text = extract_text_from_pdf(file.file)
-        text = clean_text(text)
+        yield json.dumps({
+            "status": "done",
+            "files": len(entries),
+            "unique_documents": len(by_doc),
+            "total_ms": elapsed_ms(started)
+        }) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+        for entry in entries:
+            if entry.get("path"):
+                remove_quietly(entry["path"])
+
+@app.post("/process/batch")
+async def process_pdf_batch(
+    files: List[UploadFile] = File(...),
+    include_summary: bool = True,
+    include_questions: bool = True
+):
+    """Process many PDFs (or zip files of PDFs) in one request.
+
+    Identical files are processed once. Up to BATCH_DOCUMENT_CONCURRENCY
+    documents are processed in parallel, each admitted on its own, and all
+    their LLM calls share BATCH_LLM_CONCURRENCY slots. Results are
+    streamed as NDJSON, one line per file as it finishes, followed by a
+    line with status "done".
+    """
+    entries = await spool_batch_uploads(files)
+    if not entries:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    
+    return StreamingResponse(
+        batch_results(entries, include_summary, include_questions),
+        media_type="application/x-ndjson"
+    )
+
+async def run_document_job(ctx: JobContext, pdf_path: str, doc_id: str, filename: str,
+                           include_summary: bool, include_questions: bool) -> dict:
+    """Background version of /process that reports progress per stage"""
+    # Jobs are already queued, so they wait for capacity instead of being shed
+    async with admitted(upload_cost(os.path.getsize(pdf_path)), "bulk", shed=False):
+        started = time.perf_counter()
+        timings = {}
+        
+        await ctx.start_stage("extraction")
+        text = await load_document_from_path(pdf_path, doc_id, filename)
+        if len(text.strip()) < 50:
+            raise HTTPException(status_code=400, detail="PDF appears to be empty or contains very little text")
+        await ctx.finish_stage("extraction", text_length=len(text))
+        timings["extraction_ms"] = elapsed_ms(started)
+        
+        async def summary_stage() -> str:
+            await ctx.start_stage("summary")
+            sections_done = []
+            
+            def on_section(index: int, total: int, section_summary: str):
+                sections_done.append(index)
+                ctx.progress("summary", len(sections_done), total)
+            
+            summary = await generate_summary_with_groq(text, on_section=on_section)
+            await ctx.finish_stage("summary")
+            return summary
+        
+        async def questions_stage() -> List[str]:
+            await ctx.start_stage("questions")
+            questions = await generate_questions_with_groq(text)
+            await ctx.finish_stage("questions")
+            return questions
+        
+        stages = {}
+        if include_summary:
+            stages["summary"] = timed(summary_stage())
+        else:
+            await ctx.skip_stage("summary")
+        if include_questions:
+            stages["questions"] = timed(questions_stage())
+        else:
+            await ctx.skip_stage("questions")
         
-        answer = await answer_question_with_groq(text, question)
+        results = dict(zip(stages, await asyncio.gather(*stages.values())))
         
-        logger.info("Question answered successfully")
+        summary, timings["summary_ms"] = results.get("summary", (None, None))
+        questions, timings["questions_ms"] = results.get("questions", (None, None))
+        timings["total_ms"] = elapsed_ms(started)
         
         return {
-            "answer": answer,
-            "status": "success",
-            "api_type": "groq_free_enhanced_formatted"
+            "summary": summary,
+            "questions": questions,
+            "text_length": len(text),
+            "summary_length": len(summary) if summary else 0,
+            "filename": filename,
+            "doc_id": doc_id,
+            "timings": timings
         }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error answering question: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error answering question: {str(e)}")
+
+def job_queue_full(retry_after: int) -> HTTPException:
+    JOBS_SHED.inc()
+    logger.warning(f"Rejecting job: {job_queue.depth} jobs already queued")
+    return HTTPException(
+        status_code=503,
+        detail="Too many jobs queued, please retry later",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    file: UploadFile = File(...),
+    include_summary: bool = True,
+    include_questions: bool = True
+):
+    """Queue a PDF for background processing and return its job id right away.
+
+    Poll GET /jobs/{job_id} for per-stage progress and the final result,
+    which has the same shape as the /process response. Returns 503 once
+    JOB_MAX_QUEUED jobs are waiting.
+    """
+    validate_pdf_upload(file)
+    if job_queue.full:
+        raise job_queue_full(job_queue.retry_after())
+    pdf_path, doc_id = await save_upload(file)
+    
+    job = new_job(["extraction", "summary", "questions"], filename=file.filename, doc_id=doc_id)
+    try:
+        await job_queue.submit(
+            job,
+            lambda ctx: run_document_job(ctx, pdf_path, doc_id, file.filename, include_summary, include_questions),
+            cleanup=lambda: remove_quietly(pdf_path)
+        )
+    except QueueFull as e:
+        remove_quietly(pdf_path)
+        raise job_queue_full(e.retry_after)
+    
+    logger.info(f"Queued job {job['job_id']} for {file.filename}")
+    
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/jobs/{job['job_id']}",
+        "queue_depth": job_queue.depth
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, per-stage progress and (once finished) the result of a job"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
-• Try using different keywords
-• Check if the topic is covered under a different term
-• Consider asking a more general question about the document content"""
-            
-    except Exception as e:
-        return """**Error:**
-I encountered an error while trying to answer that question.
-
-**Suggestion:**
-Please try rephrasing your question or contact support if the issue persists."""
\ No newline at end of file
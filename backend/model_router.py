@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from typing import Collection, Dict, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+DURATION_PART = re.compile(r'([\d.]+)(ms|h|m|s)')
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Parse '12', '7.5s', '2m59.56s' or '850ms' into seconds"""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    multipliers = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * multipliers[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds until a rate-limited model may be called again, from response headers"""
+    for header in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        value = headers.get(header)
+        if value:
+            seconds = parse_duration(value)
+            if seconds is not None:
+                return seconds
+    return None
+
+
+def jittered_backoff(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class ModelState:
+    """Health of one model as seen from this process"""
+
+    def __init__(self, name: str, rank: int):
+        self.name = name
+        self.rank = rank
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.rate_limited_until = 0.0
+        self.latency_ewma: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self.rate_limits = 0
+
+    def available_at(self) -> float:
+        return max(self.open_until, self.rate_limited_until)
+
+    def to_dict(self, now: float) -> Dict[str, object]:
+        return {
+            "available": self.available_at() <= now,
+            "circuit_open": self.open_until > now,
+            "rate_limited_for": round(max(0.0, self.rate_limited_until - now), 1),
+            "latency_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rate_limits": self.rate_limits
+        }
+
+
+class ModelRouter:
+    """Picks the best model that is currently worth calling.
+
+    Models are preferred in the configured order. A model is skipped while
+    its rate limit window (from Retry-After style headers) is running or
+    while its circuit breaker is open. The breaker opens after
+    `failure_threshold` consecutive 429/5xx/transport failures. Once
+    `open_seconds` have passed it is half-open: calls go through again, but a
+    single further failure re-opens it straight away. A model whose
+    average latency is more than `slow_factor` times the fastest available
+    model's drops behind the others.
+    """
+
+    def __init__(self, models: List[str], failure_threshold: int = 3, open_seconds: float = 30.0,
+                 default_retry_after: float = 10.0, slow_factor: float = 3.0):
+        self.states = {name: ModelState(name, rank) for rank, name in enumerate(models)}
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.default_retry_after = default_retry_after
+        self.slow_factor = slow_factor
+
+    def pick(self, avoid: Collection[str] = (), now: Optional[float] = None) -> Optional[str]:
+        """Best available model right now, or None if every model is cooling down.
+
+        Models in `avoid` (typically those that already failed for this call)
+        are only picked when no other model is available.
+        """
+        now = time.monotonic() if now is None else now
+        candidates = [state for state in self.states.values() if state.available_at() <= now]
+        if not candidates:
+            return None
+        fresh = [state for state in candidates if state.name not in avoid]
+        candidates = fresh or candidates
+
+        latencies = [state.latency_ewma for state in candidates if state.latency_ewma is not None]
+        fastest = min(latencies) if latencies else None
+
+        def sort_key(state: ModelState):
+            slow = (
+                fastest is not None and state.latency_ewma is not None
+                and state.latency_ewma > fastest * self.slow_factor
+            )
+            return (slow, state.rank)
+
+        return min(candidates, key=sort_key).name
+
+    def seconds_until_available(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        return max(0.0, min(state.available_at() for state in self.states.values()) - now)
+
+    async def wait_for_model(self, max_wait: float, avoid: Collection[str] = ()) -> Optional[str]:
+        """Pick a model, sleeping until one frees up if that takes at most max_wait seconds"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            model = self.pick(avoid)
+            if model is not None:
+                return model
+            wait = self.seconds_until_available()
+            if time.monotonic() + wait > deadline:
+                return None
+            # Spread waiters out so they don't all retry in the same instant
+            await asyncio.sleep(wait + random.uniform(0, min(1.0, wait * 0.1 + 0.05)))
+
+    def record_success(self, model: str, latency: float) -> None:
+        state = self.states[model]
+        state.successes += 1
+        state.consecutive_failures = 0
+        state.open_until = 0.0
+        state.latency_ewma = latency if state.latency_ewma is None else 0.8 * state.latency_ewma + 0.2 * latency
+
+    def record_rate_limit(self, model: str, retry_after: Optional[float]) -> None:
+        state = self.states[model]
+        state.rate_limits += 1
+        wait = retry_after if retry_after is not None else self.default_retry_after
+        state.rate_limited_until = time.monotonic() + wait
+        logger.warning(f"Rate limit hit for {model}, skipping it for {wait:.1f}s")
+        self._count_failure(state)
+
+    def record_failure(self, model: str, reason: str) -> None:
+        state = self.states[model]
+        logger.warning(f"API call failed for {model}: {reason}")
+        self._count_failure(state)
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        now = time.monotonic()
+        return {name: state.to_dict(now) for name, state in self.states.items()}
+
+    def _count_failure(self, state: ModelState) -> None:
+        state.failures += 1
+        state.consecutive_failures += 1
+        if state.consecutive_failures >= self.failure_threshold:
+            state.open_until = time.monotonic() + self.open_seconds
+            logger.warning(f"Circuit opened for {state.name} for {self.open_seconds:.0f}s")
@@ -0,0 +1,219 @@
+import itertools
+import logging
+import sqlite3
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from retrieval import TOKEN_PATTERN
+from sqlite_tier import SQLiteTier
+
+logger = logging.getLogger(__name__)
+
+# Universal hashing modulo a Mersenne prime keeps every product inside 64 bits
+PRIME = (1 << 31) - 1
+
+
+class MinHasher:
+    """MinHash sketches of word shingles.
+
+    Token hashes are CRC32 and the permutations come from a fixed seed, so a
+    sketch is the same in every process and can be stored and compared later.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_words: int = 5, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        self._shingle_multipliers = rng.integers(1, PRIME, size=shingle_words, dtype=np.int64)
+        self._a = rng.integers(1, PRIME, size=num_perm, dtype=np.int64)
+        self._b = rng.integers(0, PRIME, size=num_perm, dtype=np.int64)
+
+    def sketch(self, text: str) -> Optional[np.ndarray]:
+        """num_perm minimum hashes of the text's shingles, or None for text without words"""
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        if not tokens:
+            return None
+
+        token_hashes = np.fromiter(
+            map(zlib.crc32, map(str.encode, tokens)), dtype=np.int64, count=len(tokens)
+        ) % PRIME
+        width = min(self.shingle_words, len(tokens))
+        count = len(tokens) - width + 1
+        shingles = np.zeros(count, dtype=np.int64)
+        for j in range(width):
+            shingles = (shingles + token_hashes[j:j + count] * self._shingle_multipliers[j] % PRIME) % PRIME
+        shingles = np.unique(shingles)
+
+        return ((np.outer(self._a, shingles) + self._b[:, None]) % PRIME).min(axis=1)
+
+
+def estimated_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Jaccard similarity of the shingle sets, estimated from two sketches"""
+    return float(np.mean(a == b))
+
+
+def band_keys(sketch: np.ndarray, bands: int) -> List[bytes]:
+    """LSH bucket keys: near-duplicates share at least one band with high probability"""
+    rows = len(sketch) // bands
+    return [bytes([band]) + sketch[band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+
+
+class NearDuplicateIndex:
+    """Groups the chunks of one document as they are added.
+
+    add() returns the index of an earlier chunk whose estimated similarity
+    is at least `threshold`, or the new chunk's own index when it starts a
+    group. Only group representatives are indexed.
+    """
+
+    def __init__(self, threshold: float = 0.8, bands: int = 16):
+        self.threshold = threshold
+        self.bands = bands
+        self._sketches: Dict[int, np.ndarray] = {}
+        self._buckets: Dict[bytes, List[int]] = {}
+        self._count = 0
+
+    def add(self, sketch: Optional[np.ndarray]) -> int:
+        index = self._count
+        self._count += 1
+        if sketch is None:
+            return index
+
+        keys = band_keys(sketch, self.bands)
+        candidates = sorted({i for key in keys for i in self._buckets.get(key, ())})
+        for candidate in candidates:
+            if estimated_similarity(sketch, self._sketches[candidate]) >= self.threshold:
+                return candidate
+
+        self._sketches[index] = sketch
+        for key in keys:
+            self._buckets.setdefault(key, []).append(index)
+        return index
+
+
+class SectionSketchStore:
+    """Section summaries keyed by the MinHash sketch of their chunk.
+
+    Lets a chunk that is a near-duplicate of one from a previously processed
+    document reuse that section summary. The store is shared by every
+    upload, so a match hands one document's summary to another; whatever
+    differs between the two chunks (a name, a figure) is not in the reused
+    summary. Keep `threshold` well above the one used within a document.
+
+    A bounded in-memory LRU with LSH buckets sits in front of an optional
+    SQLite file holding at most max_db_entries sketches, oldest dropped
+    first.
+    """
+
+    def __init__(self, max_entries: int = 10000, threshold: float = 0.95, bands: int = 16,
+                 db_path: Optional[str] = None, max_db_entries: int = 100000):
+        self.max_entries = max_entries
+        self.max_db_entries = max_db_entries
+        self.threshold = threshold
+        self.bands = bands
+        self.db_path = db_path
+        self._entries: "OrderedDict[int, Tuple[np.ndarray, str]]" = OrderedDict()
+        self._buckets: Dict[bytes, Set[int]] = {}
+        self._ids = itertools.count()
+        self._db: Optional[SQLiteTier] = None
+        self.hits = 0
+        self.misses = 0
+
+        if self.db_path:
+            self._db = SQLiteTier(self.db_path, [
+                "CREATE TABLE IF NOT EXISTS sketches (id INTEGER PRIMARY KEY AUTOINCREMENT, sketch BLOB, summary TEXT)",
+                "CREATE TABLE IF NOT EXISTS bands (key BLOB, id INTEGER)",
+                "CREATE INDEX IF NOT EXISTS bands_key ON bands (key)",
+                "CREATE INDEX IF NOT EXISTS bands_id ON bands (id)"
+            ])
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries)
+        }
+
+    async def lookup(self, sketch: np.ndarray) -> Optional[str]:
+        """Summary of the most similar stored section, if it is similar enough"""
+        keys = band_keys(sketch, self.bands)
+        best_id, best_similarity = None, self.threshold
+        for entry_id in {i for key in keys for i in self._buckets.get(key, ())}:
+            similarity = estimated_similarity(sketch, self._entries[entry_id][0])
+            if similarity >= best_similarity:
+                best_id, best_similarity = entry_id, similarity
+
+        if best_id is not None:
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][1]
+
+        if self._db is not None:
+            summary = await self._db.run(self._db_lookup, sketch, keys)
+            if summary is not None:
+                self._remember(sketch, summary)
+                self.hits += 1
+                return summary
+
+        self.misses += 1
+        return None
+
+    async def put(self, sketch: np.ndarray, summary: str) -> None:
+        self._remember(sketch, summary)
+        if self._db is not None:
+            try:
+                await self._db.run(self._db_put, sketch, summary)
+            except Exception as e:
+                logger.warning(f"Could not persist section sketch: {str(e)}")
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, sketch: np.ndarray, summary: str) -> None:
+        entry_id = next(self._ids)
+        self._entries[entry_id] = (sketch, summary)
+        for key in band_keys(sketch, self.bands):
+            self._buckets.setdefault(key, set()).add(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            old_id, (old_sketch, _) = self._entries.popitem(last=False)
+            for key in band_keys(old_sketch, self.bands):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(old_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def _db_lookup(self, db: sqlite3.Connection, sketch: np.ndarray, keys: List[bytes]) -> Optional[str]:
+        placeholders = ",".join("?" * len(keys))
+        rows = db.execute(
+            f"SELECT s.sketch, s.summary FROM sketches s WHERE s.id IN "
+            f"(SELECT DISTINCT id FROM bands WHERE key IN ({placeholders}))",
+            keys
+        ).fetchall()
+
+        best, best_similarity = None, self.threshold
+        for stored_sketch, summary in rows:
+            similarity = estimated_similarity(sketch, np.frombuffer(stored_sketch, dtype=np.int64))
+            if similarity >= best_similarity:
+                best, best_similarity = summary, similarity
+        return best
+
+    def _db_put(self, db: sqlite3.Connection, sketch: np.ndarray, summary: str) -> None:
+        cursor = db.execute("INSERT INTO sketches (sketch, summary) VALUES (?, ?)", (sketch.tobytes(), summary))
+        db.executemany(
+            "INSERT INTO bands (key, id) VALUES (?, ?)",
+            [(key, cursor.lastrowid) for key in band_keys(sketch, self.bands)]
+        )
+        # Ids only grow, so everything max_db_entries behind the newest one is the oldest
+        oldest_kept = cursor.lastrowid - self.max_db_entries
+        db.execute("DELETE FROM sketches WHERE id <= ?", (oldest_kept,))
+        db.execute("DELETE FROM bands WHERE id <= ?", (oldest_kept,))
+        db.commit()
@@ -0,0 +1,140 @@
+import re
+from collections import Counter
+from typing import Iterable, List
+
+# Bare page numbers: "12", "- 12 -", "Page 12", "Page 12 of 40", "12/40"
+PAGE_NUMBER_LINE = re.compile(r'[-–\s]*(page\s*)?\d+(\s*(of|/)\s*\d+)?[-–\s]*', re.IGNORECASE)
+DIGITS = re.compile(r'\d+')
+SENTENCE_END_CHARS = (".", "!", "?", ":")
+CLOSING_CHARS = "\"')]"
+
+
+def line_signature(line: str) -> str:
+    """Key that matches a running header or footer across pages, whatever the page number"""
+    return DIGITS.sub("#", line.lower())
+
+
+def is_hyphenated(line: str) -> bool:
+    """Line ends in a word broken across lines ("exam-" followed by "ple")"""
+    return len(line) > 1 and line[-1] == "-" and line[-2].isalpha()
+
+
+def ends_sentence(line: str) -> bool:
+    return line.rstrip(CLOSING_CHARS)[-1:] in SENTENCE_END_CHARS
+
+
+class PageNormalizer:
+    """Clean extracted pages for the LLM while keeping paragraph structure.
+
+    Lines that recur on at least min_share of the pages seen (and on at least
+    min_pages of them) are running headers, footers or boilerplate, and are
+    removed. In the top and bottom edge_lines of a page, lines recur when
+    they match up to their digits (a header with the page number or date in
+    it); elsewhere only the exact same text counts, so body lines that
+    differ in their figures are kept. Page numbers are removed too:
+    "Page 3 of 40" near the top or bottom of a page, and a bare number as
+    the first (or last) line when pages recur in
+    starting (or ending) with one. Other lines that are only a number, such
+    as table figures, are kept. Words hyphenated across a line break
+    are rejoined. Lines are merged into paragraphs that end at blank lines or
+    at a short line that closes a sentence. Each line is handled a constant
+    number of times, so the cost is linear in the text.
+
+    observe() every page before normalizing it. Pages can be streamed: a
+    page is then judged against the pages observed so far.
+    """
+
+    def __init__(self, min_pages: int = 3, min_share: float = 0.5, short_line_ratio: float = 0.6,
+                 edge_lines: int = 2):
+        self.min_pages = min_pages
+        self.min_share = min_share
+        self.short_line_ratio = short_line_ratio
+        self.edge_lines = edge_lines
+        self.pages_seen = 0
+        self.line_pages: Counter = Counter()  # Exact lines
+        self.edge_pages: Counter = Counter()  # Signatures of lines at the top or bottom of a page
+        self.numbered_edges: Counter = Counter()  # Pages whose first / last line is a bare number
+        self.removed_lines = 0
+
+    def observe(self, page: str) -> None:
+        self.pages_seen += 1
+        lines = [" ".join(line.split()) for line in page.splitlines() if line.strip()]
+        self.line_pages.update({line for line in lines if not PAGE_NUMBER_LINE.fullmatch(line)})
+        self.edge_pages.update({
+            line_signature(line) for position, line in enumerate(lines)
+            if self.at_edge(position, len(lines)) and not PAGE_NUMBER_LINE.fullmatch(line)
+        })
+        if lines and PAGE_NUMBER_LINE.fullmatch(lines[0]):
+            self.numbered_edges["first"] += 1
+        if lines and PAGE_NUMBER_LINE.fullmatch(lines[-1]):
+            self.numbered_edges["last"] += 1
+
+    def recurs(self, pages: int) -> bool:
+        return pages >= self.min_pages and pages >= self.min_share * self.pages_seen
+
+    def at_edge(self, position: int, count: int) -> bool:
+        return position < self.edge_lines or position >= count - self.edge_lines
+
+    def is_repeated(self, line: str, position: int, count: int) -> bool:
+        if self.recurs(self.line_pages[line]):
+            return True
+        return self.at_edge(position, count) and self.recurs(self.edge_pages[line_signature(line)])
+
+    def is_page_number(self, line: str, position: int, count: int) -> bool:
+        """Whether a line matching PAGE_NUMBER_LINE, at position among count non-empty lines, is a page number"""
+        if any(c.isalpha() for c in line):
+            return self.at_edge(position, count)
+        return (position == 0 and self.recurs(self.numbered_edges["first"])
+                or position == count - 1 and self.recurs(self.numbered_edges["last"]))
+
+    def normalize(self, page: str) -> str:
+        lines = [" ".join(line.split()) for line in page.splitlines()]
+        count = sum(1 for line in lines if line)
+        kept = []
+        position = 0
+        for line in lines:
+            if not line:
+                kept.append(line)
+                continue
+            if PAGE_NUMBER_LINE.fullmatch(line):
+                removed = self.is_page_number(line, position, count)
+            else:
+                removed = self.is_repeated(line, position, count)
+            position += 1
+            if removed:
+                self.removed_lines += 1
+                continue
+            kept.append(line)
+
+        lengths = sorted(len(line) for line in kept if line)
+        typical_length = lengths[len(lengths) // 2] if lengths else 0
+
+        paragraphs = []
+        parts: List[str] = []  # Pieces of the current paragraph, joined once it ends
+        for line in kept:
+            if not line:
+                if parts:
+                    paragraphs.append("".join(parts))
+                parts = []
+                continue
+            if parts and is_hyphenated(parts[-1]) and line[0].islower():
+                parts[-1] = parts[-1][:-1]
+            elif parts and not parts[-1].endswith("-"):
+                parts.append(" ")
+            parts.append(line)
+            if len(line) < self.short_line_ratio * typical_length and ends_sentence(line):
+                paragraphs.append("".join(parts))
+                parts = []
+        if parts:
+            paragraphs.append("".join(parts))
+
+        return "\n\n".join(paragraphs)
+
+
+def normalize_pages(pages: Iterable[str]) -> List[str]:
+    """Normalize a whole document's pages at once (see PageNormalizer)"""
+    pages = list(pages)
+    normalizer = PageNormalizer()
+    for page in pages:
+        normalizer.observe(page)
+    return [normalizer.normalize(page) for page in pages]
@@ -0,0 +1,152 @@
+import logging
+import sqlite3
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlite_tier import SQLiteTier
+
+logger = logging.getLogger(__name__)
+
+
+class PageTextCache:
+    """Extracted text per (document hash, engine, page).
+
+    Pages are stored as soon as their range is extracted, so a document whose
+    processing was interrupted, or one re-uploaded after it left the document
+    cache, only extracts the pages that are missing. A byte-bounded
+    in-memory LRU (per document) sits in front of an optional SQLite file
+    that keeps the pages of at most max_db_documents documents, dropping
+    the least recently used ones.
+    """
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024, db_path: Optional[str] = None,
+                 max_db_documents: int = 1000):
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.max_db_documents = max_db_documents
+        self._documents: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        self._bytes = 0
+        self._db: Optional[SQLiteTier] = None
+        self.page_hits = 0
+        self.page_misses = 0
+
+        if self.db_path:
+            self._db = SQLiteTier(self.db_path, [
+                "CREATE TABLE IF NOT EXISTS pages "
+                "(doc_id TEXT, engine TEXT, page INTEGER, text TEXT, PRIMARY KEY (doc_id, engine, page))",
+                "CREATE TABLE IF NOT EXISTS documents (doc_id TEXT, engine TEXT, page_count INTEGER, "
+                "PRIMARY KEY (doc_id, engine))"
+            ])
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.page_hits + self.page_misses
+        return {
+            "page_hits": self.page_hits,
+            "page_misses": self.page_misses,
+            "hit_ratio": round(self.page_hits / lookups, 3) if lookups else 0.0,
+            "documents": len(self._documents),
+            "bytes": self._bytes
+        }
+
+    async def get_pages(self, doc_id: str, engine: str) -> Tuple[Optional[int], Dict[int, str]]:
+        """(page count or None, {page index: text}) of what is cached for a document"""
+        key = (doc_id, engine)
+        entry = self._documents.get(key)
+        if entry is None and self._db is not None:
+            page_count, pages = await self._db.run(self._db_get, doc_id, engine)
+            if page_count is not None or pages:
+                entry = self._remember(key, page_count, pages)
+
+        if entry is None:
+            return None, {}
+        self._documents.move_to_end(key)
+        return entry["page_count"], dict(entry["pages"])
+
+    async def put_pages(self, doc_id: str, engine: str, page_count: int, pages: Dict[int, str]) -> None:
+        """Add freshly extracted pages of a document"""
+        key = (doc_id, engine)
+        entry = self._documents.get(key)
+        if entry is None:
+            self._remember(key, page_count, pages)
+        else:
+            entry["page_count"] = page_count
+            self._add_pages(entry, pages)
+            self._documents.move_to_end(key)
+            self._evict(keep=key)
+
+        if self._db is not None:
+            try:
+                await self._db.run(self._db_put, doc_id, engine, page_count, pages)
+            except Exception as e:
+                logger.warning(f"Could not persist extracted pages: {str(e)}")
+
+    def record_lookup(self, hits: int, misses: int) -> None:
+        self.page_hits += hits
+        self.page_misses += misses
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key: Tuple[str, str], page_count: Optional[int], pages: Dict[int, str]) -> dict:
+        entry = {"page_count": page_count, "pages": {}, "bytes": 0}
+        self._documents[key] = entry
+        self._add_pages(entry, pages)
+        self._evict(keep=key)
+        return entry
+
+    def _add_pages(self, entry: dict, pages: Dict[int, str]) -> None:
+        for page, text in pages.items():
+            size = len(text)
+            previous = entry["pages"].get(page)
+            if previous is not None:
+                size -= len(previous)
+            entry["pages"][page] = text
+            entry["bytes"] += size
+            self._bytes += size
+
+    def _evict(self, keep: Tuple[str, str]) -> None:
+        # Drop least recently used documents, but always keep the one just touched
+        while self._bytes > self.max_bytes and len(self._documents) > 1:
+            key, entry = next(iter(self._documents.items()))
+            if key == keep:
+                break
+            del self._documents[key]
+            self._bytes -= entry["bytes"]
+
+    # A document row is re-inserted whenever the document is used, so rowid order is LRU order
+
+    @staticmethod
+    def _db_get(db: sqlite3.Connection, doc_id: str, engine: str) -> Tuple[Optional[int], Dict[int, str]]:
+        row = db.execute(
+            "SELECT page_count FROM documents WHERE doc_id = ? AND engine = ?", (doc_id, engine)
+        ).fetchone()
+        rows = db.execute(
+            "SELECT page, text FROM pages WHERE doc_id = ? AND engine = ?", (doc_id, engine)
+        ).fetchall()
+        if row is not None:
+            db.execute(
+                "INSERT OR REPLACE INTO documents (doc_id, engine, page_count) VALUES (?, ?, ?)",
+                (doc_id, engine, row[0])
+            )
+            db.commit()
+        return (row[0] if row else None), {page: text for page, text in rows}
+
+    def _db_put(self, db: sqlite3.Connection, doc_id: str, engine: str, page_count: int,
+                pages: Dict[int, str]) -> None:
+        db.execute(
+            "INSERT OR REPLACE INTO documents (doc_id, engine, page_count) VALUES (?, ?, ?)",
+            (doc_id, engine, page_count)
+        )
+        db.executemany(
+            "INSERT OR REPLACE INTO pages (doc_id, engine, page, text) VALUES (?, ?, ?, ?)",
+            [(doc_id, engine, page, text) for page, text in pages.items()]
+        )
+        stale = db.execute(
+            "SELECT doc_id, engine FROM documents ORDER BY rowid DESC LIMIT -1 OFFSET ?", (self.max_db_documents,)
+        ).fetchall()
+        for stale_doc_id, stale_engine in stale:
+            db.execute("DELETE FROM pages WHERE doc_id = ? AND engine = ?", (stale_doc_id, stale_engine))
+            db.execute("DELETE FROM documents WHERE doc_id = ? AND engine = ?", (stale_doc_id, stale_engine))
+        db.commit()
@@ -0,0 +1,234 @@
+import logging
+import mmap
+import re
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import PyPDF2
+
+# Optional faster engines, used when installed and selected
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+try:
+    from pdfminer.high_level import extract_pages as pdfminer_extract_pages
+    from pdfminer.layout import LTTextContainer
+except ImportError:
+    pdfminer_extract_pages = None
+
+logger = logging.getLogger(__name__)
+
+# Everything in this module runs inside extraction worker processes, so the
+# functions are kept top-level (picklable) and free of FastAPI imports.
+
+# "3", "3-7" or the open-ended "3-"
+PAGE_RANGE = re.compile(r'(\d+)(-(\d*))?')
+
+DEFAULT_ENGINE = "pypdf2"
+
+
+@contextmanager
+def open_pdf(path: str) -> Iterator[PyPDF2.PdfReader]:
+    """Open a PDF file through a read-only mmap.
+
+    The pages are served from the OS page cache, so workers sharing one
+    upload don't each hold a private copy of it.
+    """
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield PyPDF2.PdfReader(mapped)
+
+
+class PyPDF2Engine:
+    """Pure-Python extraction with PyPDF2 (always available)"""
+
+    name = "pypdf2"
+
+    def count_pages(self, path: str) -> int:
+        with open_pdf(path) as pdf_reader:
+            return len(pdf_reader.pages)
+
+    def extract_pages(self, path: str, start: int, end: int) -> List[str]:
+        page_texts = []
+        with open_pdf(path) as pdf_reader:
+            for i in range(start, min(end, len(pdf_reader.pages))):
+                try:
+                    page_text = pdf_reader.pages[i].extract_text()
+                    page_texts.append(page_text.strip() if page_text else "")
+                    logger.debug(f"Extracted text from page {i+1}")
+                except Exception as e:
+                    logger.warning(f"Could not extract text from page {i+1}: {str(e)}")
+                    page_texts.append("")
+        return page_texts
+
+
+class PdfiumEngine:
+    """PDFium (the Chrome PDF library) through pypdfium2 - much faster than PyPDF2"""
+
+    name = "pypdfium2"
+
+    def count_pages(self, path: str) -> int:
+        pdf = pypdfium2.PdfDocument(path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    def extract_pages(self, path: str, start: int, end: int) -> List[str]:
+        page_texts = []
+        pdf = pypdfium2.PdfDocument(path)
+        try:
+            for i in range(start, min(end, len(pdf))):
+                page = text_page = None
+                try:
+                    page = pdf[i]
+                    text_page = page.get_textpage()
+                    page_texts.append(text_page.get_text_range().replace("\r\n", "\n").strip())
+                except Exception as e:
+                    logger.warning(f"Could not extract text from page {i+1}: {str(e)}")
+                    page_texts.append("")
+                finally:
+                    if text_page is not None:
+                        text_page.close()
+                    if page is not None:
+                        page.close()
+        finally:
+            pdf.close()
+        return page_texts
+
+
+class PdfminerEngine:
+    """pdfminer.six layout analysis - slower, but better reading order on complex layouts"""
+
+    name = "pdfminer"
+
+    def count_pages(self, path: str) -> int:
+        return PyPDF2Engine().count_pages(path)
+
+    def extract_pages(self, path: str, start: int, end: int) -> List[str]:
+        page_texts = []
+        page = start
+        while page < end:
+            # pdfminer parses pages lazily, so a broken page ends the iteration;
+            # record it as empty and carry on from the next page
+            try:
+                for page_layout in pdfminer_extract_pages(path, page_numbers=range(page, end)):
+                    page_texts.append("".join(
+                        element.get_text() for element in page_layout if isinstance(element, LTTextContainer)
+                    ).strip())
+                    page += 1
+                break
+            except Exception as e:
+                logger.warning(f"Could not extract text from page {page+1}: {str(e)}")
+                page_texts.append("")
+                page += 1
+        return page_texts
+
+
+ENGINES = {
+    PyPDF2Engine.name: (PyPDF2Engine, True),
+    PdfiumEngine.name: (PdfiumEngine, pypdfium2 is not None),
+    PdfminerEngine.name: (PdfminerEngine, pdfminer_extract_pages is not None),
+}
+
+# "auto" picks the first installed engine in this order
+AUTO_ORDER = ("pypdfium2", "pypdf2")
+
+
+def available_engines() -> List[str]:
+    return [name for name, (_, installed) in ENGINES.items() if installed]
+
+
+def resolve_engine(name: str) -> str:
+    """Name of the engine to use for a configured name, falling back to PyPDF2"""
+    name = (name or DEFAULT_ENGINE).lower()
+    if name == "auto":
+        return next(engine for engine in AUTO_ORDER if ENGINES[engine][1])
+    if name not in ENGINES:
+        logger.warning(f"Unknown extraction engine '{name}', using {DEFAULT_ENGINE}")
+        return DEFAULT_ENGINE
+    if not ENGINES[name][1]:
+        logger.warning(f"Extraction engine '{name}' is not installed, using {DEFAULT_ENGINE}")
+        return DEFAULT_ENGINE
+    return name
+
+
+def get_engine(name: str = DEFAULT_ENGINE):
+    return ENGINES[name][0]()
+
+
+def count_pages(path: str, engine: str = DEFAULT_ENGINE) -> int:
+    """Number of pages in the PDF"""
+    return get_engine(engine).count_pages(path)
+
+
+def extract_page_range(path: str, start: int, end: int, engine: str = DEFAULT_ENGINE) -> List[str]:
+    """Extract pages [start, end) and return one (possibly empty) string per page"""
+    return get_engine(engine).extract_pages(path, start, end)
+
+
+def split_page_ranges(page_count: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    """Split [0, page_count) into consecutive ranges of at most pages_per_task pages"""
+    pages_per_task = max(1, pages_per_task)
+    return [
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+
+
+def missing_page_ranges(page_count: int, cached_pages: Iterable[int], pages_per_task: int,
+                        wanted_pages: Optional[Iterable[int]] = None) -> List[Tuple[int, int]]:
+    """Ranges of at most pages_per_task consecutive pages that are not cached yet.
+
+    Only pages in wanted_pages are considered when it is given.
+    """
+    cached = set(cached_pages)
+    pages_per_task = max(1, pages_per_task)
+    wanted = range(page_count) if wanted_pages is None else sorted(set(wanted_pages))
+    ranges = []
+    start = previous = None
+    for page in wanted:
+        if page in cached or not 0 <= page < page_count:
+            continue
+        if start is not None and (page != previous + 1 or page - start == pages_per_task):
+            ranges.append((start, previous + 1))
+            start = None
+        if start is None:
+            start = page
+        previous = page
+    if start is not None:
+        ranges.append((start, previous + 1))
+    return ranges
+
+
+def parse_page_ranges(spec: str) -> List[Tuple[int, Optional[int]]]:
+    """Parse a 1-based page selection such as "1-10,15,40-" into (first, last) pairs.
+
+    last is None for an open-ended range. Raises ValueError on bad syntax.
+    """
+    ranges = []
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        match = PAGE_RANGE.fullmatch(part)
+        if not match:
+            raise ValueError(f"Invalid page range '{part}'")
+        first = int(match.group(1))
+        last = first if match.group(2) is None else (int(match.group(3)) if match.group(3) else None)
+        if first < 1 or (last is not None and last < first):
+            raise ValueError(f"Invalid page range '{part}'")
+        ranges.append((first, last))
+    if not ranges:
+        raise ValueError("No pages selected")
+    return ranges
+
+
+def select_pages(ranges: List[Tuple[int, Optional[int]]], page_count: int) -> List[int]:
+    """Sorted 0-based indices of the selected pages that exist in the document"""
+    selected = set()
+    for first, last in ranges:
+        last = page_count if last is None else min(last, page_count)
+        selected.update(range(first - 1, last))
+    return sorted(selected)
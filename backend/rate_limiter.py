@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `per_minute` units per minute"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.refill_per_second = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def seconds_until(self, amount: float, now: float) -> float:
+        """How long until `amount` units are available (amount is capped at capacity)"""
+        self.refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.refill_per_second) if missing > 0 else 0.0
+
+    def consume(self, amount: float, now: float) -> None:
+        self.refill(now)
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Client-side requests/min and tokens/min budgets per model.
+
+    Calls wait in FIFO order (one lock per model) until both buckets have
+    room, so bursts are smoothed out to just under the provider limits
+    instead of tripping 429s.
+    """
+
+    def __init__(self, default_limits: Tuple[float, float], model_limits: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.default_limits = default_limits
+        self.model_limits = model_limits or {}
+        self.buckets: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.rejections = 0
+
+    def _buckets(self, model: str) -> Tuple[TokenBucket, TokenBucket]:
+        if model not in self.buckets:
+            requests_per_minute, tokens_per_minute = self.model_limits.get(model, self.default_limits)
+            self.buckets[model] = (TokenBucket(requests_per_minute), TokenBucket(tokens_per_minute))
+        return self.buckets[model]
+
+    def delay(self, model: str, tokens: int) -> float:
+        """Seconds until a call of `tokens` estimated tokens may be sent to `model`"""
+        now = time.monotonic()
+        requests, token_budget = self._buckets(model)
+        return max(requests.seconds_until(1, now), token_budget.seconds_until(tokens, now))
+
+    async def acquire(self, model: str, tokens: int, max_wait: float) -> bool:
+        """Wait for budget and consume it. Returns False if that would take longer than max_wait"""
+        lock = self.locks.setdefault(model, asyncio.Lock())
+        started = time.monotonic()
+
+        async with lock:
+            while True:
+                wait = self.delay(model, tokens)
+                if wait <= 0:
+                    now = time.monotonic()
+                    requests, token_budget = self._buckets(model)
+                    requests.consume(1, now)
+                    token_budget.consume(tokens, now)
+                    waited = now - started
+                    if waited > 0.001:
+                        self.waits += 1
+                        self.wait_seconds += waited
+                    return True
+                if time.monotonic() - started + wait > max_wait:
+                    self.rejections += 1
+                    return False
+                await asyncio.sleep(wait)
+
+    def stats(self) -> Dict[str, object]:
+        now = time.monotonic()
+        models = {}
+        for model, (requests, token_budget) in self.buckets.items():
+            requests.refill(now)
+            token_budget.refill(now)
+            models[model] = {
+                "requests_available": round(requests.level, 1),
+                "tokens_available": round(token_budget.level)
+            }
+        return {
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 2),
+            "rejections": self.rejections,
+            "models": models
+        }
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls so only one reaches the upstream API.
+
+    The shared call runs as its own task, so one caller disconnecting does
+    not cancel it for everyone else waiting on the same key.
+    """
+
+    def __init__(self):
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[str]]) -> str:
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
@@ -0,0 +1,90 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from chunking import estimate_tokens
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'did', 'do', 'does',
+    'for', 'from', 'had', 'has', 'have', 'how', 'in', 'into', 'is', 'it', 'its',
+    'of', 'on', 'or', 'that', 'the', 'their', 'there', 'these', 'this', 'to',
+    'was', 'were', 'what', 'when', 'where', 'which', 'who', 'why', 'will',
+    'with', 'about', 'document', 'mentioned', 'according'
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords and single characters removed"""
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+class PassageIndex:
+    """BM25 index over the passages of one document"""
+
+    def __init__(self, passages: List[str], k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+
+        for i, passage in enumerate(passages):
+            counts = Counter(tokenize(passage))
+            self.lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, []).append((i, frequency))
+
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def estimated_bytes(self) -> int:
+        """Rough memory footprint: passage text plus the terms and their postings"""
+        return sum(len(passage) for passage in self.passages) + sum(
+            len(term) + 100 + 64 * len(postings) for term, postings in self.postings.items()
+        ) + 8 * len(self.lengths)
+
+    def idf(self, term: str) -> float:
+        document_frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.passages) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Return up to k (passage index, score) pairs, best first"""
+        scores: Dict[int, float] = {}
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for i, frequency in postings:
+                length_norm = 1 - self.b + self.b * self.lengths[i] / (self.avg_length or 1)
+                scores[i] = scores.get(i, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def select(self, query: str, max_tokens: int, k: int = 8) -> List[str]:
+        """Best matching passages that fit in max_tokens, returned in document order"""
+        return [self.passages[i] for i in self.select_ids(query, max_tokens, k)]
+
+    def select_ids(self, query: str, max_tokens: int, k: int = 8) -> List[int]:
+        """Indexes of the passages select() would return, in document order"""
+        selected = []
+        used_tokens = 0
+
+        for i, _ in self.search(query, k):
+            passage_tokens = estimate_tokens(self.passages[i])
+            if used_tokens + passage_tokens > max_tokens:
+                continue
+            selected.append(i)
+            used_tokens += passage_tokens
+
+        return sorted(selected)
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlite_tier import SQLiteTier
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def page_hashes(pages: List[str]) -> List[str]:
+    return [content_hash(page) for page in pages]
+
+
+def count_changed_pages(previous_hashes: List[str], hashes: List[str]) -> int:
+    """Pages of the new version whose text does not appear in the previous one (as a multiset)"""
+    remaining = Counter(previous_hashes)
+    changed = 0
+    for page_hash in hashes:
+        if remaining[page_hash] > 0:
+            remaining[page_hash] -= 1
+        else:
+            changed += 1
+    return changed
+
+
+class RevisionStore:
+    """Page hashes of processed documents and section summaries by chunk hash.
+
+    A new upload is compared page by page with the previous version the
+    caller names by its doc_id. Versions are never looked up any other way
+    (e.g. by filename): a doc_id gives access to its document, so only a
+    caller that already holds one may use it.
+
+    When summary chunks are page-aligned and content-defined
+    (chunking.PageChunkAccumulator), a chunk whose pages did not change
+    has exactly the same text and its stored summary is reused instead of
+    calling the LLM. Bounded in-memory LRUs sit in front of an optional
+    SQLite file, which keeps at most max_db_documents documents and
+    max_db_summaries summaries, dropping the least recently used.
+    """
+
+    def __init__(self, max_documents: int = 1000, max_summaries: int = 20000, db_path: Optional[str] = None,
+                 max_db_documents: int = 100000, max_db_summaries: int = 200000):
+        self.max_documents = max_documents
+        self.max_summaries = max_summaries
+        self.max_db_documents = max_db_documents
+        self.max_db_summaries = max_db_summaries
+        self.db_path = db_path
+        self._writes_since_purge = 0
+        self._documents: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._db: Optional[SQLiteTier] = None
+        self.summary_hits = 0
+        self.summary_misses = 0
+
+        if self.db_path:
+            self._db = SQLiteTier(self.db_path, [
+                "CREATE TABLE IF NOT EXISTS documents "
+                "(doc_id TEXT PRIMARY KEY, page_hashes TEXT, updated_at REAL)",
+                "CREATE TABLE IF NOT EXISTS summaries (chunk_hash TEXT PRIMARY KEY, summary TEXT)"
+            ])
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.summary_hits + self.summary_misses
+        return {
+            "documents": len(self._documents),
+            "summaries": len(self._summaries),
+            "summary_hits": self.summary_hits,
+            "summary_misses": self.summary_misses,
+            "hit_ratio": round(self.summary_hits / lookups, 3) if lookups else 0.0
+        }
+
+    async def get_page_hashes(self, doc_id: str) -> Optional[List[str]]:
+        """Page hashes of a processed document, if it is known"""
+        hashes = self._documents.get(doc_id)
+        if hashes is not None:
+            self._documents.move_to_end(doc_id)
+            return hashes
+
+        if self._db is not None:
+            row = await self._db.run(self._db_get_document, doc_id)
+            if row is not None:
+                return json.loads(row[0])
+        return None
+
+    async def put_document(self, doc_id: str, hashes: List[str]) -> None:
+        self._documents[doc_id] = hashes
+        self._documents.move_to_end(doc_id)
+        while len(self._documents) > self.max_documents:
+            self._documents.popitem(last=False)
+
+        if self._db is not None:
+            try:
+                await self._db.run(self._db_put_document, doc_id, hashes)
+            except Exception as e:
+                logger.warning(f"Could not persist document revision: {str(e)}")
+
+    async def get_summary(self, chunk_hash: str) -> Optional[str]:
+        summary = self._summaries.get(chunk_hash)
+        if summary is None and self._db is not None:
+            summary = await self._db.run(self._db_get_summary, chunk_hash)
+            if summary is not None:
+                self._remember_summary(chunk_hash, summary)
+
+        if summary is None:
+            self.summary_misses += 1
+            return None
+        self._summaries.move_to_end(chunk_hash)
+        self.summary_hits += 1
+        return summary
+
+    async def put_summary(self, chunk_hash: str, summary: str) -> None:
+        self._remember_summary(chunk_hash, summary)
+        if self._db is not None:
+            try:
+                await self._db.run(self._db_put_summary, chunk_hash, summary)
+            except Exception as e:
+                logger.warning(f"Could not persist section summary: {str(e)}")
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember_summary(self, chunk_hash: str, summary: str) -> None:
+        self._summaries[chunk_hash] = summary
+        self._summaries.move_to_end(chunk_hash)
+        while len(self._summaries) > self.max_summaries:
+            self._summaries.popitem(last=False)
+
+    # Rows are re-inserted whenever they are used, so rowid order is LRU order
+
+    @staticmethod
+    def _db_get_document(db: sqlite3.Connection, doc_id: str) -> Optional[Tuple[str]]:
+        return db.execute("SELECT page_hashes FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+
+    def _db_put_document(self, db: sqlite3.Connection, doc_id: str, hashes: List[str]) -> None:
+        db.execute(
+            "INSERT OR REPLACE INTO documents (doc_id, page_hashes, updated_at) VALUES (?, ?, ?)",
+            (doc_id, json.dumps(hashes), time.time())
+        )
+        self._purge_now_and_then(db)
+        db.commit()
+
+    @staticmethod
+    def _db_get_summary(db: sqlite3.Connection, chunk_hash: str) -> Optional[str]:
+        row = db.execute("SELECT summary FROM summaries WHERE chunk_hash = ?", (chunk_hash,)).fetchone()
+        if row is None:
+            return None
+        db.execute("INSERT OR REPLACE INTO summaries (chunk_hash, summary) VALUES (?, ?)", (chunk_hash, row[0]))
+        db.commit()
+        return row[0]
+
+    def _db_put_summary(self, db: sqlite3.Connection, chunk_hash: str, summary: str) -> None:
+        db.execute("INSERT OR REPLACE INTO summaries (chunk_hash, summary) VALUES (?, ?)", (chunk_hash, summary))
+        self._purge_now_and_then(db)
+        db.commit()
+
+    def _purge_now_and_then(self, db: sqlite3.Connection) -> None:
+        self._writes_since_purge += 1
+        if self._writes_since_purge < 100:
+            return
+        for table, limit in (("documents", self.max_db_documents), ("summaries", self.max_db_summaries)):
+            db.execute(
+                f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+                (limit,)
+            )
+        self._writes_since_purge = 0
@@ -0,0 +1,37 @@
+import asyncio
+import sqlite3
+import threading
+from typing import Callable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+class SQLiteTier:
+    """The SQLite file behind a cache's in-memory tier.
+
+    One connection is shared between worker threads and guarded by a lock.
+    Queries are plain functions taking the connection; run() calls them in
+    a worker thread so they never block the event loop.
+    """
+
+    def __init__(self, path: str, schema: Iterable[str] = ()):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            for statement in schema:
+                self._connection.execute(statement)
+            self._connection.commit()
+
+    def call(self, query: Callable[..., T], *args) -> T:
+        """query(connection, *args) in the calling thread, holding the lock"""
+        with self._lock:
+            return query(self._connection, *args)
+
+    async def run(self, query: Callable[..., T], *args) -> T:
+        """call() in a worker thread"""
+        return await asyncio.to_thread(self.call, query, *args)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
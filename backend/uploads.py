@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import os
+import tempfile
+import zipfile
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload goes over the configured byte limit"""
+
+
+class RequestBodyTooLarge(HTTPException):
+    """Raised from receive() once a request body passes its limit"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(status_code=413, detail=f"Request body too large. Maximum size is {max_bytes // (1024 * 1024)}MB")
+
+
+class RequestBodyLimit:
+    """ASGI middleware enforcing a byte limit while a request body streams in.
+
+    limit_for(path) gives the limit of a route. A declared Content-Length
+    over it is answered with 413 before the app runs; otherwise the bytes
+    received are counted and reading fails with 413 as soon as they pass
+    the limit, so an oversized body is never spooled in full.
+    """
+
+    def __init__(self, app, limit_for: Callable[[str], int]):
+        self.app = app
+        self.limit_for = limit_for
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.limit_for(scope["path"])
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > max_bytes:
+                await self._reject(max_bytes, scope, receive, send)
+                return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise RequestBodyTooLarge(max_bytes)
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except RequestBodyTooLarge:
+            # Normally the app's exception handlers answer it; this covers reads outside a route
+            if response_started:
+                raise
+            await self._reject(max_bytes, scope, receive, send)
+
+    @staticmethod
+    async def _reject(max_bytes: int, scope, receive, send) -> None:
+        error = RequestBodyTooLarge(max_bytes)
+        await JSONResponse({"detail": error.detail}, status_code=error.status_code)(scope, receive, send)
+
+
+async def spool_upload(file: UploadFile, max_bytes: int, tmp_dir: Optional[str] = None) -> Tuple[str, str, int]:
+    """Copy an upload to a temp file in fixed-size chunks, hashing as it goes.
+
+    Returns (path, sha256 hex digest, size). Only one chunk is held in memory
+    at a time and the copy stops as soon as max_bytes is exceeded. The caller
+    owns the returned file and must remove it.
+    """
+    await file.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        remove_quietly(path)
+        raise
+
+    return path, digest.hexdigest(), size
+
+
+def spool_zip_members(zip_path: str, max_bytes: int, max_files: int, max_total_bytes: int,
+                      max_ratio: float, tmp_dir: Optional[str] = None) -> List[Tuple[str, str, str, int]]:
+    """Copy every PDF inside a zip file to its own temp file, hashing as it goes.
+
+    Returns (member name, path, sha256 hex digest, size) per PDF. Raises
+    ValueError for an unreadable archive, more than max_files PDFs, a member
+    over max_bytes or compressed more than max_ratio times, or members
+    totalling over max_total_bytes, removing anything already written.
+    Sizes declared in the archive are checked before anything is written,
+    and the bytes actually decompressed are checked again while copying.
+    """
+    members = []
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            names = [
+                info for info in archive.infolist()
+                if not info.is_dir() and info.filename.lower().endswith(".pdf")
+                and not os.path.basename(info.filename).startswith(".")
+            ]
+            if len(names) > max_files:
+                raise ValueError(f"Zip file contains more than {max_files} PDFs")
+            for info in names:
+                if info.file_size > max_bytes:
+                    raise ValueError(f"{info.filename} exceeds {max_bytes} bytes")
+                if info.file_size > max_ratio * max(info.compress_size, 1):
+                    raise ValueError(f"{info.filename} is compressed suspiciously well")
+            if sum(info.file_size for info in names) > max_total_bytes:
+                raise ValueError(f"Zip file contents exceed {max_total_bytes} bytes")
+
+            total = 0
+            for info in names:
+
+                digest = hashlib.sha256()
+                size = 0
+                fd, path = tempfile.mkstemp(suffix=".pdf", dir=tmp_dir)
+                members.append((info.filename, path, "", 0))
+                with archive.open(info) as source, os.fdopen(fd, "wb") as out:
+                    while True:
+                        chunk = source.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        total += len(chunk)
+                        if size > max_bytes:
+                            raise ValueError(f"{info.filename} exceeds {max_bytes} bytes")
+                        if total > max_total_bytes:
+                            raise ValueError(f"Zip file contents exceed {max_total_bytes} bytes")
+                        if size > max_ratio * max(info.compress_size, 1):
+                            raise ValueError(f"{info.filename} is compressed suspiciously well")
+                        digest.update(chunk)
+                        out.write(chunk)
+                members[-1] = (info.filename, path, digest.hexdigest(), size)
+    except zipfile.BadZipFile:
+        for _, path, _, _ in members:
+            remove_quietly(path)
+        raise ValueError("Not a valid zip file")
+    except BaseException:
+        for _, path, _, _ in members:
+            remove_quietly(path)
+        raise
+
+    return members
+
+
+def remove_quietly(path: str) -> None:
+    """Delete a temp file, ignoring it if it is already gone"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Could not remove temp file {path}: {str(e)}")
@@ -4,6 +4,7 @@ import { Upload, Loader2, FileText, X, ChevronRight, ArrowLeft, RotateCcw } from
 type ApiResponse = {
   summary?: string;
   questions?: string[];
+  doc_id?: string;
 };
 
 type AnswerResponse = {
@@ -106,14 +107,27 @@ const Summarizer: React.FC = () => {
     setError('');
 
     try {
-      const formData = new FormData();
-      formData.append('file', file);
-      formData.append('question', userQuestion);
+      const askWith = (useDocId: boolean): Promise<Response> => {
+        const formData = new FormData();
+        // Reuse the server-side cached document when we have its id
+        if (useDocId && results?.doc_id) {
+          formData.append('doc_id', results.doc_id);
+        } else {
+          formData.append('file', file);
+        }
+        formData.append('question', userQuestion);
 
-      const response = await fetch(`${import.meta.env.VITE_API_URL}/ask`, {
-        method: 'POST',
-        body: formData,
-      });
+        return fetch(`${import.meta.env.VITE_API_URL}/ask`, {
+          method: 'POST',
+          body: formData,
+        });
+      };
+
+      let response = await askWith(true);
+      if (response.status === 404 && results?.doc_id) {
+        // Cached document was evicted, fall back to uploading the file
+        response = await askWith(false);
+      }
 
       if (!response.ok) {
         const errorData = await response.json();